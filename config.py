@@ -0,0 +1,233 @@
+import os
+from dataclasses import dataclass
+
+from queue_admission import OVERFLOW_POLICIES
+from state_store import STATE_BACKENDS
+
+# Variabel lingkungan yang wajib diatur (lihat secrets di GitHub Actions)
+REQUIRED_ENV_VARS = [
+    'FB_ACCESS_TOKEN',
+    'FB_PAGE_ID',
+    'GEMINI_API_KEY',
+    'TELEGRAM_BOT_TOKEN',
+    'TELEGRAM_CHAT_ID',
+]
+
+
+class ConfigError(ValueError):
+    """Konfigurasi dari variabel lingkungan tidak lengkap atau tidak valid."""
+
+
+@dataclass(frozen=True)
+class Config:
+    """Konfigurasi AutoPost yang sudah divalidasi."""
+    fb_access_token: str
+    fb_page_id: str
+    gemini_api_key: str
+    telegram_bot_token: str
+    telegram_chat_id: int
+
+    # Batasan posting per run
+    max_posts_per_run: int = 1
+
+    # Timeout long poll getUpdates (detik); 0 = short poll, cocok untuk cron
+    telegram_poll_timeout: int = 0
+
+    # Model Gemini untuk caption (lihat gemini_processor.py)
+    gemini_model: str = 'gemini-2.0-flash'
+
+    # Pre-caption (opsional): caption item antrean yang belum diposting diproses Gemini
+    # di latar belakang, sehingga saat giliran posting tiba cukup mengunggah saja.
+    precaption_enabled: bool = False
+    precaption_budget_seconds: float = 60.0
+    precaption_max_items: int = 5
+
+    # Admission control antrean: batas 0 berarti tidak dibatasi
+    max_queue_length: int = 200
+    max_queue_bytes: int = 0
+    queue_overflow_policy: str = 'drop_oldest'
+    queue_archive_file: str = 'pending_media_archive.jsonl'
+
+    # Backend state dan retensi ledger (lihat state_store.py)
+    state_backend: str = 'json'
+    state_db_file: str = None
+    posted_media_max_entries: int = 2000
+
+    # Unduhan Telegram (lihat telegram_fetcher.py)
+    download_part_size: int = 2 * 1024 * 1024
+    download_parallel_threshold: int = 4 * 1024 * 1024
+    download_workers: int = 4
+    file_info_cache_ttl: int = 3300
+    # Berapa run berturut-turut unduhan media boleh gagal sebelum item dikeluarkan dari antrean
+    max_download_attempts: int = 3
+
+    # Cache media (lihat media_cache.py)
+    media_cache_dir: str = 'media_cache'
+    media_cache_max_bytes: int = 1024 * 1024 * 1024
+    media_cache_pin_count: int = 5
+
+    # Aturan klasifikasi Reels (lihat video_utils.classify_reels)
+    reel_min_duration: float = 0.0
+    reel_max_duration: float = 60.0
+    reel_aspect_ranges: tuple = ((0.5525, 0.81),)
+    reel_respect_rotation: bool = True
+
+    @property
+    def reel_rules(self):
+        """Aturan Reels dalam bentuk yang diharapkan video_utils.classify_reels()."""
+        return {
+            'min_duration': self.reel_min_duration,
+            'max_duration': self.reel_max_duration,
+            'aspect_ranges': self.reel_aspect_ranges,
+            'respect_rotation': self.reel_respect_rotation,
+        }
+
+
+def _parse_number(environ, name, cast, default):
+    """Membaca variabel lingkungan numerik, melempar ConfigError jika tidak valid."""
+    raw = environ.get(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        return cast(raw)
+    except ValueError:
+        raise ConfigError(f"{name} tidak valid: '{raw}'. Harus berupa angka.")
+
+
+def _parse_bool(environ, name, default):
+    """Membaca variabel lingkungan boolean (true/false, 1/0, yes/no, on/off), melempar ConfigError jika tidak valid."""
+    raw = environ.get(name)
+    if raw is None or raw.strip() == "":
+        return default
+    value = raw.strip().lower()
+    if value in ('true', '1', 'yes', 'on'):
+        return True
+    if value in ('false', '0', 'no', 'off'):
+        return False
+    raise ConfigError(f"{name} tidak valid: '{raw}'. Gunakan true/false.")
+
+
+def _parse_aspect_ranges(raw):
+    """Mengurai REEL_ASPECT_RANGES ("min-max,min-max", rasio desimal) menjadi tuple (min, max)."""
+    ranges = []
+    for part in raw.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            low, high = (float(value) for value in part.split('-'))
+        except ValueError:
+            raise ConfigError(
+                f"REEL_ASPECT_RANGES tidak valid: '{raw}'. Gunakan format desimal, misalnya '0.55-0.81'."
+            )
+        if low <= 0 or low > high:
+            raise ConfigError(f"Rentang rasio aspek tidak valid di REEL_ASPECT_RANGES: '{part}'.")
+        ranges.append((low, high))
+    if not ranges:
+        raise ConfigError("REEL_ASPECT_RANGES tidak boleh kosong.")
+    return tuple(ranges)
+
+
+def load_config(environ=None):
+    """
+    Membaca dan memvalidasi konfigurasi dari variabel lingkungan.
+    Melempar ConfigError jika ada variabel wajib yang kosong atau nilai yang tidak valid.
+    """
+    environ = os.environ if environ is None else environ
+
+    missing = [name for name in REQUIRED_ENV_VARS if not environ.get(name)]
+    if missing:
+        raise ConfigError(f"Variabel lingkungan tidak lengkap: {', '.join(missing)}")
+
+    try:
+        telegram_chat_id = int(environ['TELEGRAM_CHAT_ID'])
+    except ValueError:
+        raise ConfigError("TELEGRAM_CHAT_ID tidak valid. Pastikan ini adalah ID numerik.")
+
+    max_posts_per_run = _parse_number(environ, 'MAX_POSTS_PER_RUN', int, 1)
+    if max_posts_per_run < 1:
+        raise ConfigError("MAX_POSTS_PER_RUN harus minimal 1.")
+
+    precaption_budget_seconds = _parse_number(environ, 'PRECAPTION_BUDGET_SECONDS', float, 60.0)
+    precaption_max_items = _parse_number(environ, 'PRECAPTION_MAX_ITEMS', int, 5)
+    if precaption_budget_seconds <= 0 or precaption_max_items < 1:
+        raise ConfigError("PRECAPTION_BUDGET_SECONDS harus lebih dari 0 dan PRECAPTION_MAX_ITEMS minimal 1.")
+
+    telegram_poll_timeout = _parse_number(environ, 'TELEGRAM_POLL_TIMEOUT', int, 0)
+    if telegram_poll_timeout < 0:
+        raise ConfigError("TELEGRAM_POLL_TIMEOUT tidak boleh negatif.")
+
+    max_queue_length = _parse_number(environ, 'MAX_QUEUE_LENGTH', int, 200)
+    max_queue_bytes = _parse_number(environ, 'MAX_QUEUE_BYTES', int, 0)
+    if max_queue_length < 0 or max_queue_bytes < 0:
+        raise ConfigError("MAX_QUEUE_LENGTH dan MAX_QUEUE_BYTES tidak boleh negatif.")
+    if max_queue_length and max_queue_length < max_posts_per_run:
+        raise ConfigError("MAX_QUEUE_LENGTH tidak boleh lebih kecil dari MAX_POSTS_PER_RUN.")
+
+    queue_overflow_policy = environ.get('QUEUE_OVERFLOW_POLICY', 'drop_oldest')
+    if queue_overflow_policy not in OVERFLOW_POLICIES:
+        raise ConfigError(
+            f"QUEUE_OVERFLOW_POLICY tidak valid: '{queue_overflow_policy}'. "
+            f"Pilihan: {', '.join(OVERFLOW_POLICIES)}"
+        )
+
+    state_backend = environ.get('STATE_BACKEND', 'json')
+    if state_backend not in STATE_BACKENDS:
+        raise ConfigError(
+            f"STATE_BACKEND tidak valid: '{state_backend}'. Pilihan: {', '.join(STATE_BACKENDS)}"
+        )
+
+    posted_media_max_entries = _parse_number(environ, 'POSTED_MEDIA_MAX_ENTRIES', int, 2000)
+    if posted_media_max_entries < 0:
+        raise ConfigError("POSTED_MEDIA_MAX_ENTRIES tidak boleh negatif (0 = tidak dipangkas).")
+
+    download_part_size = _parse_number(environ, 'DOWNLOAD_PART_SIZE', int, 2 * 1024 * 1024)
+    download_workers = _parse_number(environ, 'DOWNLOAD_WORKERS', int, 4)
+    if download_part_size < 1 or download_workers < 1:
+        raise ConfigError("DOWNLOAD_PART_SIZE dan DOWNLOAD_WORKERS harus minimal 1.")
+
+    reel_min_duration = _parse_number(environ, 'REEL_MIN_DURATION', float, 0.0)
+    reel_max_duration = _parse_number(environ, 'REEL_MAX_DURATION', float, 60.0)
+    if reel_min_duration < 0 or reel_min_duration > reel_max_duration:
+        raise ConfigError("REEL_MIN_DURATION harus >= 0 dan tidak lebih besar dari REEL_MAX_DURATION.")
+
+    media_cache_dir = environ.get('MEDIA_CACHE_DIR') or 'media_cache'
+    if os.path.realpath(media_cache_dir) == os.path.realpath(os.getcwd()):
+        raise ConfigError("MEDIA_CACHE_DIR tidak boleh sama dengan direktori kerja.")
+    media_cache_max_bytes = _parse_number(environ, 'MEDIA_CACHE_MAX_BYTES', int, 1024 * 1024 * 1024)
+    media_cache_pin_count = _parse_number(environ, 'MEDIA_CACHE_PIN_COUNT', int, 5)
+    if media_cache_max_bytes < 0 or media_cache_pin_count < 0:
+        raise ConfigError("MEDIA_CACHE_MAX_BYTES dan MEDIA_CACHE_PIN_COUNT tidak boleh negatif.")
+
+    return Config(
+        fb_access_token=environ['FB_ACCESS_TOKEN'],
+        fb_page_id=environ['FB_PAGE_ID'],
+        gemini_api_key=environ['GEMINI_API_KEY'],
+        telegram_bot_token=environ['TELEGRAM_BOT_TOKEN'],
+        telegram_chat_id=telegram_chat_id,
+        max_posts_per_run=max_posts_per_run,
+        telegram_poll_timeout=telegram_poll_timeout,
+        gemini_model=environ.get('GEMINI_MODEL') or 'gemini-2.0-flash',
+        precaption_enabled=_parse_bool(environ, 'PRECAPTION_ENABLED', False),
+        precaption_budget_seconds=precaption_budget_seconds,
+        precaption_max_items=precaption_max_items,
+        max_queue_length=max_queue_length,
+        max_queue_bytes=max_queue_bytes,
+        queue_overflow_policy=queue_overflow_policy,
+        queue_archive_file=environ.get('QUEUE_ARCHIVE_FILE', 'pending_media_archive.jsonl'),
+        state_backend=state_backend,
+        state_db_file=environ.get('STATE_DB_FILE') or None,
+        posted_media_max_entries=posted_media_max_entries,
+        download_part_size=download_part_size,
+        download_parallel_threshold=_parse_number(environ, 'DOWNLOAD_PARALLEL_THRESHOLD', int, 4 * 1024 * 1024),
+        download_workers=download_workers,
+        file_info_cache_ttl=_parse_number(environ, 'FILE_INFO_CACHE_TTL', int, 3300),
+        max_download_attempts=max(_parse_number(environ, 'MAX_DOWNLOAD_ATTEMPTS', int, 3), 1),
+        media_cache_dir=media_cache_dir,
+        media_cache_max_bytes=media_cache_max_bytes,
+        media_cache_pin_count=media_cache_pin_count,
+        reel_min_duration=reel_min_duration,
+        reel_max_duration=reel_max_duration,
+        reel_aspect_ranges=_parse_aspect_ranges(environ.get('REEL_ASPECT_RANGES', '0.5525-0.81')),
+        reel_respect_rotation=_parse_bool(environ, 'REEL_RESPECT_ROTATION', True),
+    )
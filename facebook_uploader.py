@@ -3,9 +3,6 @@ import os
 import logging
 import json
 
-# Konfigurasi logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
 def _log_error_response(e):
     """Fungsi pembantu untuk mencatat detail respons error HTTP."""
     if hasattr(e, 'response') and e.response is not None:
@@ -101,6 +98,8 @@ def upload_video(file_path, caption, access_token, page_id):
 # Facebook akan otomatis mendeteksi Reels dari upload_video() jika memenuhi syarat.
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
     # Contoh penggunaan (untuk pengujian lokal)
     # Ganti dengan token akses, ID halaman, dan jalur file Anda yang sebenarnya
     TEST_FB_ACCESS_TOKEN = os.getenv('FB_ACCESS_TOKEN_TEST', 'YOUR_FB_ACCESS_TOKEN_HERE')
@@ -1,10 +1,13 @@
-import google.generativeai as genai
 import random
+import time
+import hashlib
 import logging
 import os
+import threading
 
-# Konfigurasi logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Model Gemini. Caption hasil pre-caption dianggap kedaluwarsa jika model atau prompt berubah.
+# Nilai default; main.py menimpanya lewat configure() dengan nilai dari config.Config.
+GEMINI_MODEL = 'gemini-2.0-flash'
 
 # Daftar caption fallback lucu
 FALLBACK_CAPTIONS = [
@@ -20,6 +23,51 @@ FALLBACK_CAPTIONS = [
     "Selamat datang di dunia absurditas yang menyenangkan. Siap-siap terhibur! 🥳"
 ]
 
+def configure(model=None):
+    """Menerapkan model Gemini dari config.Config."""
+    global GEMINI_MODEL
+    if model is not None:
+        GEMINI_MODEL = model
+
+def _build_prompt(original_caption):
+    """Menyusun prompt Gemini untuk caption tertentu."""
+    # Menambahkan instruksi eksplisit untuk tagar Reels/Shorts
+    return (
+        f"Saya memiliki caption berikut dari sebuah video atau foto yang akan diposting ke Facebook Reels:\n\n"
+        f"'{original_caption}'\n\n"
+        f"Tolong bersihkan caption ini dari informasi yang tidak relevan (seperti ID internal, URL yang tidak perlu, atau teks sistem), "
+        f"dan buatlah lebih menarik, lucu, atau relevan untuk audiens Facebook Reels. "
+        f"Tambahkan emoji yang sesuai. Untuk video, sertakan tagar seperti #Reels, #Shorts, #VideoPendek, atau #KontenLucu. "
+        f"Pastikan caption tidak terlalu panjang (maksimal 200 karakter). "
+        f"Jika caption sudah bagus, cukup sempurnakan sedikit. "
+        f"Berikan hanya caption yang sudah diproses, tanpa tambahan teks atau penjelasan."
+    )
+
+# Versi prompt diturunkan dari isi template, jadi otomatis berubah setiap kali prompt diedit
+PROMPT_VERSION = hashlib.sha1(_build_prompt('{caption}').encode('utf-8')).hexdigest()[:12]
+
+def _generate_caption(original_caption, gemini_api_key):
+    """
+    Memanggil Gemini API untuk caption yang tidak kosong.
+    Melempar exception jika gagal; pemanggil yang menentukan fallback.
+    """
+    # Impor lazy: google.generativeai (grpc, protobuf) berat dan hanya dibutuhkan saat memanggil Gemini
+    import google.generativeai as genai
+
+    genai.configure(api_key=gemini_api_key)
+    model = genai.GenerativeModel(GEMINI_MODEL)
+
+    logging.info("Mengirim caption ke Gemini API untuk diproses...")
+    response = model.generate_content(_build_prompt(original_caption))
+    processed_text = response.text.strip()
+
+    # Batasi panjang caption yang diproses
+    if len(processed_text) > 200:
+        processed_text = processed_text[:197] + "..." # Potong dan tambahkan elipsis
+
+    logging.info(f"Caption dari Gemini: {processed_text}")
+    return processed_text
+
 def process_caption(original_caption, gemini_api_key):
     """
     Memproses caption menggunakan Gemini API untuk membersihkan dan membuatnya menarik.
@@ -31,45 +79,76 @@ def process_caption(original_caption, gemini_api_key):
             return random.choice(FALLBACK_CAPTIONS)
         return original_caption
 
-    genai.configure(api_key=gemini_api_key)
-    model = genai.GenerativeModel('gemini-2.0-flash')
-
     # Cek apakah caption kosong atau generik (misalnya, hanya spasi)
     if not original_caption or original_caption.strip() == "":
         logging.info("Caption asli kosong atau generik. Menggunakan fallback caption.")
         return random.choice(FALLBACK_CAPTIONS)
 
-    # Prompt untuk Gemini API
-    # Menambahkan instruksi eksplisit untuk tagar Reels/Shorts
-    prompt = (
-        f"Saya memiliki caption berikut dari sebuah video atau foto yang akan diposting ke Facebook Reels:\n\n"
-        f"'{original_caption}'\n\n"
-        f"Tolong bersihkan caption ini dari informasi yang tidak relevan (seperti ID internal, URL yang tidak perlu, atau teks sistem), "
-        f"dan buatlah lebih menarik, lucu, atau relevan untuk audiens Facebook Reels. "
-        f"Tambahkan emoji yang sesuai. Untuk video, sertakan tagar seperti #Reels, #Shorts, #VideoPendek, atau #KontenLucu. "
-        f"Pastikan caption tidak terlalu panjang (maksimal 200 karakter). "
-        f"Jika caption sudah bagus, cukup sempurnakan sedikit. "
-        f"Berikan hanya caption yang sudah diproses, tanpa tambahan teks atau penjelasan."
-    )
-
     try:
-        logging.info("Mengirim caption ke Gemini API untuk diproses...")
-        response = model.generate_content(prompt)
-        processed_text = response.text.strip()
-
-        # Batasi panjang caption yang diproses
-        if len(processed_text) > 200:
-            processed_text = processed_text[:197] + "..." # Potong dan tambahkan elipsis
-
-        logging.info(f"Caption dari Gemini: {processed_text}")
-        return processed_text
+        return _generate_caption(original_caption, gemini_api_key)
     except Exception as e:
         logging.error(f"Gagal memproses caption dengan Gemini API: {e}. Menggunakan caption asli atau fallback.", exc_info=True)
-        if not original_caption or original_caption.strip() == "":
-            return random.choice(FALLBACK_CAPTIONS)
         return original_caption
 
+def get_precaption(media_info):
+    """
+    Mengembalikan caption hasil pre-caption untuk media_info jika masih berlaku
+    (caption asli, model, dan versi prompt sama), atau None.
+    """
+    precaption = media_info.get('precaption')
+    if not precaption:
+        return None
+    if (precaption.get('prompt_version') != PROMPT_VERSION
+            or precaption.get('model') != GEMINI_MODEL
+            or precaption.get('source_caption') != media_info.get('caption', '')):
+        return None
+    return precaption.get('caption')
+
+def precaption_items(media_items, gemini_api_key, budget_seconds, max_items, results=None, lock=None):
+    """
+    Memproses caption beberapa item antrean lebih awal, dalam batas waktu dan jumlah tertentu.
+    Mengembalikan dictionary file_unique_id -> entri precaption untuk disimpan di antrean.
+    Jika results (dan lock) diberikan, setiap entri langsung ditulis ke sana begitu selesai,
+    sehingga pemanggil di thread lain tetap mendapat hasil parsial saat batas waktu habis.
+    Item dengan caption kosong dilewati karena fallback tidak memerlukan Gemini.
+    """
+    results = {} if results is None else results
+    lock = lock or threading.Lock()
+    completed = 0
+    if not gemini_api_key:
+        return results
+
+    deadline = time.monotonic() + budget_seconds
+    for media_info in media_items:
+        if completed >= max_items or time.monotonic() >= deadline:
+            break
+        original_caption = media_info.get('caption', '')
+        if not original_caption or original_caption.strip() == "":
+            continue
+        if get_precaption(media_info) is not None:
+            continue
+
+        try:
+            caption = _generate_caption(original_caption, gemini_api_key)
+        except Exception as e:
+            logging.warning(f"Pre-caption gagal untuk {media_info['file_unique_id']}: {e}")
+            continue
+
+        with lock:
+            results[media_info['file_unique_id']] = {
+                'caption': caption,
+                'source_caption': original_caption,
+                'prompt_version': PROMPT_VERSION,
+                'model': GEMINI_MODEL
+            }
+        completed += 1
+
+    logging.info(f"Pre-caption selesai untuk {completed} item.")
+    return results
+
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
     # Contoh penggunaan (untuk pengujian lokal)
     TEST_GEMINI_API_KEY = os.getenv('GEMINI_API_KEY_TEST', 'YOUR_GEMINI_API_KEY_HERE') # Ganti dengan kunci API Anda
     
@@ -1,64 +1,66 @@
 import os
-import json
+import sys
 import time
 import logging
+import argparse
+import importlib
+import threading
 from datetime import datetime
 
-# Impor modul kustom
-import telegram_fetcher
-import gemini_processor
-import video_utils
-import facebook_uploader
-
-# Konfigurasi logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-# --- Variabel Lingkungan ---
-# Pastikan variabel-variabel ini diatur di lingkungan GitHub Actions Anda
-FB_ACCESS_TOKEN = os.getenv('FB_ACCESS_TOKEN')
-FB_PAGE_ID = os.getenv('FB_PAGE_ID')
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
-TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID') # Pastikan ini adalah string, bukan integer
-
-# Konversi TELEGRAM_CHAT_ID ke integer jika perlu, atau biarkan sebagai string jika API mengharapkan string
-try:
-    TELEGRAM_CHAT_ID = int(TELEGRAM_CHAT_ID)
-except (ValueError, TypeError):
-    logging.error("TELEGRAM_CHAT_ID tidak valid. Pastikan ini adalah ID numerik.")
-    exit(1)
+_PROCESS_START = time.perf_counter()
+
+# Modul ringan saja yang diimpor di awal. Modul berat (requests, google.generativeai, dll.)
+# diimpor lewat _import_stage() hanya pada tahap yang membutuhkannya.
+import state_store
+import media_cache
+import queue_admission
+from config import load_config, ConfigError
+
+# Waktu impor per modul (detik), dilaporkan oleh --profile-startup
+_import_timings = {}
+
+def _import_stage(module_name):
+    """Mengimpor modul kustom secara lazy dan mencatat lama impornya."""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    _import_timings[module_name] = time.perf_counter() - started
+    return module
 
 # --- Nama File Konfigurasi ---
 POSTED_MEDIA_FILE = 'posted_media.json'
 LAST_UPDATE_OFFSET_FILE = 'last_update_offset.txt'
 PENDING_MEDIA_FILE = 'pending_media.json' # File baru untuk antrean
 
-# --- Batasan Posting per Run ---
-MAX_POSTS_PER_RUN = 1 # Ubah nilai ini sesuai keinginan Anda (misal: 1, 2, atau 3)
+# Jika unduhan ulang gagal, slot posting diisi item antrean berikutnya. Setelah sekian kegagalan
+# dalam satu run, Telegram kemungkinan sedang bermasalah dan sisa slot tidak diisi lagi.
+MAX_DOWNLOAD_FAILURES_PER_RUN = 3
 
 # --- Fungsi Pembantu ---
 def load_json_file(file_path):
-    """Memuat data dari file JSON."""
-    if os.path.exists(file_path):
-        with open(file_path, 'r') as f:
-            try:
-                data = json.load(f)
-                logging.info(f"Memuat data dari: {os.path.abspath(file_path)}")
-                return data
-            except json.JSONDecodeError:
-                logging.warning(f"File {file_path} rusak atau kosong. Membuat yang baru.")
-                return [] if file_path == PENDING_MEDIA_FILE else {}
-    logging.info(f"File {file_path} tidak ditemukan. Membuat yang baru.")
-    return [] if file_path == PENDING_MEDIA_FILE else {}
+    """Memuat data state melalui backend state yang aktif (lihat state_store.py)."""
+    default = [] if file_path == PENDING_MEDIA_FILE else {}
+    return state_store.get_backend().load(file_path, default)
 
 def save_json_file(file_path, data):
-    """Menyimpan data ke file JSON."""
-    with open(file_path, 'w') as f:
-        json.dump(data, f, indent=4)
-    logging.info(f"Data disimpan ke: {os.path.abspath(file_path)}")
+    """Menyimpan data state melalui backend state yang aktif."""
+    if file_path == POSTED_MEDIA_FILE:
+        # Kebijakan retensi: ledger posted_media dibatasi ukurannya
+        state_store.prune_posted_media(data)
+    state_store.get_backend().save(file_path, data)
 
 def load_last_update_offset():
-    """Memuat offset update terakhir dari file teks."""
+    """Memuat offset update terakhir dari file teks atau backend state."""
+    backend = state_store.get_backend()
+    if backend.name != 'json':
+        offset = backend.load(LAST_UPDATE_OFFSET_FILE, 0)
+        try:
+            return int(offset)
+        except (ValueError, TypeError):
+            logging.warning(f"Offset tersimpan tidak valid ({offset}). Mengatur offset ke 0.")
+            return 0
+
     if os.path.exists(LAST_UPDATE_OFFSET_FILE):
         with open(LAST_UPDATE_OFFSET_FILE, 'r') as f:
             try:
@@ -72,51 +74,125 @@ def load_last_update_offset():
     return 0
 
 def save_last_update_offset(offset):
-    """Menyimpan offset update terakhir ke file teks."""
+    """Menyimpan offset update terakhir ke file teks atau backend state."""
+    backend = state_store.get_backend()
+    if backend.name != 'json':
+        backend.save(LAST_UPDATE_OFFSET_FILE, offset)
+        return
+
     with open(LAST_UPDATE_OFFSET_FILE, 'w') as f:
         f.write(str(offset))
     logging.info(f"Offset terakhir disimpan ke: {os.path.abspath(LAST_UPDATE_OFFSET_FILE)} -> {offset}")
 
-def send_telegram_notification(message):
+def send_telegram_notification(config, message):
     """Mengirim notifikasi ke Telegram."""
-    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
+    if not config.telegram_bot_token or not config.telegram_chat_id:
         logging.warning("Token bot Telegram atau ID chat tidak diatur. Tidak dapat mengirim notifikasi.")
         return
 
     # Menggunakan fungsi dari telegram_fetcher untuk mengirim pesan
     try:
-        telegram_fetcher.send_message(TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, message)
+        telegram_fetcher = _import_stage('telegram_fetcher')
+        telegram_fetcher.send_message(config.telegram_bot_token, config.telegram_chat_id, message)
         logging.info(f"Notifikasi Telegram terkirim: {message}")
     except Exception as e:
         logging.error(f"Gagal mengirim notifikasi Telegram: {e}")
 
+def start_precaption(config, media_items):
+    """
+    Menjalankan pre-caption untuk media_items di thread latar belakang.
+    Mengembalikan (thread, results, lock, deadline); results diisi file_unique_id -> entri precaption
+    satu per satu (di bawah lock) begitu tiap item selesai.
+    """
+    results = {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + config.precaption_budget_seconds
+
+    def worker():
+        gemini_processor = _import_stage('gemini_processor')
+        gemini_processor.precaption_items(
+            media_items, config.gemini_api_key, config.precaption_budget_seconds, config.precaption_max_items,
+            results=results, lock=lock
+        )
+
+    thread = threading.Thread(target=worker, name='precaption', daemon=True)
+    thread.start()
+    logging.info(f"Pre-caption dimulai di latar belakang untuk {len(media_items)} item antrean.")
+    return thread, results, lock, deadline
+
+def finish_precaption(thread, results, lock, deadline, pending_media_queue):
+    """
+    Menunggu pre-caption hanya selama sisa batas waktu yang belum terpakai oleh siklus posting,
+    lalu menyimpan semua hasil yang sudah selesai ke entri antrean.
+    """
+    thread.join(timeout=max(deadline - time.monotonic(), 0))
+    with lock:
+        finished = dict(results)
+    if thread.is_alive():
+        logging.warning(
+            f"Pre-caption belum selesai dalam batas waktu. {len(finished)} hasil yang sudah selesai disimpan, "
+            "sisanya dicoba lagi di run berikutnya."
+        )
+    for media_info in pending_media_queue:
+        precaption = finished.get(media_info['file_unique_id'])
+        if precaption:
+            media_info['precaption'] = precaption
+
 # --- Fungsi Utama AutoPost ---
-def run_autopost():
+def configure_modules(config):
+    """Meneruskan nilai dari Config ke modul yang memiliki pengaturan sendiri."""
+    state_store.configure(config.state_backend, config.state_db_file, config.posted_media_max_entries)
+    media_cache.configure(config.media_cache_dir, config.media_cache_max_bytes, config.media_cache_pin_count)
+    telegram_fetcher = _import_stage('telegram_fetcher')
+    telegram_fetcher.configure(
+        download_part_size=config.download_part_size,
+        download_parallel_threshold=config.download_parallel_threshold,
+        download_workers=config.download_workers,
+        file_info_cache_ttl=config.file_info_cache_ttl,
+        poll_timeout=config.telegram_poll_timeout
+    )
+    # Modul ringan: google.generativeai sendiri baru diimpor saat Gemini dipanggil
+    gemini_processor = _import_stage('gemini_processor')
+    gemini_processor.configure(model=config.gemini_model)
+
+def run_autopost(config):
     """Menjalankan alur utama auto-posting."""
-    if not all([FB_ACCESS_TOKEN, FB_PAGE_ID, GEMINI_API_KEY, TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID]):
-        logging.error("Variabel lingkungan tidak lengkap. Pastikan semua variabel diatur.")
-        send_telegram_notification("❌ Gagal: Variabel lingkungan tidak lengkap untuk AutoPost Facebook.")
-        return
-
+    configure_modules(config)
+    # Notifikasi awal baru dikirim setelah diketahui ada media yang diproses, sehingga siklus
+    # dengan antrean kosong hanya mengirim satu pesan
     logging.info("Memulai siklus AutoPost Facebook Reels...")
-    send_telegram_notification("🚀 Memulai siklus AutoPost Facebook Reels...")
 
     posted_media = load_json_file(POSTED_MEDIA_FILE) # Dictionary
     pending_media_queue = load_json_file(PENDING_MEDIA_FILE) # List
     last_offset = load_last_update_offset()
+    media_cache.reconcile(pending_media_queue)
+    telegram_fetcher = _import_stage('telegram_fetcher')
 
     try:
         # 1. Ambil media baru dari Telegram dan tambahkan ke antrean
         logging.info(f"Mengambil media terbaru dari Telegram (offset: {last_offset})...")
+        # Admission control: jangan unduh lebih dari sisa kapasitas antrean
+        download_limit, download_bytes_limit = queue_admission.download_headroom(
+            pending_media_queue, config.max_queue_length, config.max_queue_bytes
+        )
+        # Media baru ada di kepala antrean (terbaru dulu); hanya yang masuk jendela pin dan muat di
+        # anggaran cache yang diunduh sekarang, agar tidak langsung di-evict lalu diunduh ulang
         new_updates_from_telegram, new_max_offset_seen = telegram_fetcher.fetch_new_media(
-            TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, last_offset, posted_media
+            config.telegram_bot_token, config.telegram_chat_id, last_offset, posted_media,
+            download_limit=download_limit, download_bytes_limit=download_bytes_limit,
+            eager_limit=max(config.media_cache_pin_count, config.max_posts_per_run),
+            eager_bytes_limit=media_cache.budget_headroom(config.media_cache_max_bytes)
         )
 
         if new_updates_from_telegram:
             logging.info(f"Ditemukan {len(new_updates_from_telegram)} update baru dari Telegram.")
             # Tambahkan media baru ke antrean jika belum ada di posted_media atau pending_media
             pending_unique_ids = {item['file_unique_id'] for item in pending_media_queue}
+            # Hanya media yang ditunda karena antrean jenuh, bukan karena batas cache atau gagal diunduh
+            deferred_count = 0
             for media_info in new_updates_from_telegram:
+                if media_info.pop('download_deferred', None) == 'queue':
+                    deferred_count += 1
                 file_unique_id = media_info['file_unique_id']
                 if file_unique_id not in posted_media and file_unique_id not in pending_unique_ids:
                     pending_media_queue.append(media_info)
@@ -124,6 +200,23 @@ def run_autopost():
                     logging.info(f"Menambahkan media {file_unique_id} ke antrean.")
                 else:
                     logging.info(f"Media {file_unique_id} sudah ada di posted_media atau antrean. Melewatkan.")
+
+            pending_media_queue, overflow_media = queue_admission.admit(
+                pending_media_queue, config.max_queue_length, config.max_queue_bytes,
+                config.queue_overflow_policy, config.queue_archive_file
+            )
+            for media_info in overflow_media:
+                if media_info.get('file_path'):
+                    media_cache.remove(media_info['file_path'])
+
+            if overflow_media or deferred_count:
+                # Nama kebijakan ditulis sebagai code span: '_' di luar code span merusak parse_mode Markdown
+                send_telegram_notification(
+                    config,
+                    f"⚠️ Antrean media jenuh ({len(pending_media_queue)} item).\n"
+                    f"Dikeluarkan: {len(overflow_media)} item (kebijakan: `{config.queue_overflow_policy}`).\n"
+                    f"Tidak diunduh sekarang: {deferred_count} item."
+                )
             save_json_file(PENDING_MEDIA_FILE, pending_media_queue)
         else:
             logging.info("Tidak ada update baru dari Telegram untuk ditambahkan ke antrean.")
@@ -135,80 +228,149 @@ def run_autopost():
         # 2. Proses media dari antrean (terbaru ke terlama)
         if not pending_media_queue:
             logging.info("Antrean media kosong. Tidak ada yang perlu diposting.")
-            send_telegram_notification("ℹ️ Antrean media kosong. Tidak ada yang perlu diposting.")
-            send_telegram_notification("✅ Siklus AutoPost Facebook Reels selesai.")
+            send_telegram_notification(
+                config, "ℹ️ Siklus AutoPost Facebook Reels selesai: antrean media kosong, tidak ada yang perlu diposting."
+            )
             return
 
         # Urutkan antrean dari yang terbaru ke terlama (v5, v4, v3...)
         pending_media_queue.sort(key=lambda x: x['update_id'], reverse=True)
         
-        media_to_process_this_run = pending_media_queue[:MAX_POSTS_PER_RUN]
+        # Jaga ukuran cache media; item yang akan segera diposting di-pin agar tidak di-evict
+        evicted_ids = set(media_cache.enforce_budget(
+            [item['file_unique_id'] for item in pending_media_queue],
+            pin_count=max(config.media_cache_pin_count, config.max_posts_per_run),
+            max_bytes=config.media_cache_max_bytes
+        ))
+        for item in pending_media_queue:
+            if item['file_unique_id'] in evicted_ids:
+                item['file_path'] = None
+
+        media_to_process_this_run = pending_media_queue[:config.max_posts_per_run]
         logging.info(f"Memproses {len(media_to_process_this_run)} media dari antrean (total {len(pending_media_queue)} di antrean).")
-        send_telegram_notification(f"⏳ Akan memproses {len(media_to_process_this_run)} media dari antrean.")
+        send_telegram_notification(
+            config,
+            f"🚀 Memulai siklus AutoPost Facebook Reels...\n"
+            f"⏳ Akan memproses {len(media_to_process_this_run)} media dari antrean."
+        )
+
+        # Segarkan cache getFile sekaligus untuk media yang perlu diunduh ulang
+        telegram_fetcher.prefetch_file_info(config.telegram_bot_token, [
+            item['file_id'] for item in media_to_process_this_run
+            if not item['file_path'] or not os.path.exists(item['file_path'])
+        ])
+
+        # Pre-caption item yang belum giliran posting, berjalan bersamaan dengan proses unggah
+        precaption_job = None
+        upcoming_media = pending_media_queue[config.max_posts_per_run:]
+        if config.precaption_enabled and upcoming_media:
+            precaption_job = start_precaption(config, upcoming_media)
+
+        # Modul tahap posting baru diimpor di sini, jadi siklus dengan antrean kosong tidak memuatnya
+        gemini_processor = _import_stage('gemini_processor')
+        video_utils = _import_stage('video_utils')
+        facebook_uploader = _import_stage('facebook_uploader')
 
         processed_ids_this_run = [] # Untuk melacak media yang berhasil/gagal diproses di run ini
+        download_failures_this_run = 0
 
-        for media_info in media_to_process_this_run:
+        # Iterasi seluruh antrean: item yang gagal diunduh dilewati dan slotnya diisi item berikutnya
+        for media_info in pending_media_queue:
+            if len(processed_ids_this_run) >= config.max_posts_per_run:
+                break
             file_unique_id = media_info['file_unique_id']
             media_path = media_info['file_path']
             original_caption = media_info.get('caption', '')
             media_type = media_info['type'] # 'video' atau 'photo'
 
-            logging.info(f"Memproses media: {media_path} (ID Unik: {file_unique_id}) dari antrean.")
+            logging.info(f"Memproses media {file_unique_id} dari antrean (file: {media_path or 'belum diunduh'}).")
 
             post_status = 'failed_upload' # Default status jika terjadi kesalahan
             post_id = None
             processed_caption = ""
+            is_reel = False
 
-            try:
-                # Unduh file lagi karena file lokal mungkin sudah dihapus
-                # (Ini penting jika bot crash atau file dihapus sebelum diproses dari antrean)
-                if not os.path.exists(media_path):
+            # Unduh file lagi karena file lokal mungkin sudah dihapus atau belum pernah diunduh
+            # (Ini penting jika bot crash atau file dihapus sebelum diproses dari antrean)
+            download_failed = False
+            if not media_path or not os.path.exists(media_path):
+                if media_path:
                     logging.info(f"File lokal {media_path} tidak ditemukan, mencoba mengunduh ulang.")
-                    redownloaded_path = telegram_fetcher.download_telegram_file(
-                        TELEGRAM_BOT_TOKEN, media_info['file_id'], file_unique_id, media_type
+                else:
+                    logging.info(f"Media {file_unique_id} masuk antrean tanpa file (hanya metadata), mengunduh sekarang.")
+                redownloaded_path = telegram_fetcher.download_telegram_file(
+                    config.telegram_bot_token, media_info['file_id'], file_unique_id, media_type
+                )
+                if redownloaded_path:
+                    media_path = redownloaded_path
+                    media_info['file_path'] = media_path
+                else:
+                    attempts = media_info.get('download_attempts', 0) + 1
+                    media_info['download_attempts'] = attempts
+                    if attempts < config.max_download_attempts:
+                        # Biarkan di antrean untuk run berikutnya (unduhan parsial dilanjutkan jika cache
+                        # media dipertahankan antar run) dan lanjut ke item berikutnya
+                        logging.warning(
+                            f"Gagal mengunduh media {file_unique_id} (percobaan {attempts}/{config.max_download_attempts}). "
+                            f"Akan dicoba lagi di run berikutnya; slot posting diisi item berikutnya."
+                        )
+                        download_failures_this_run += 1
+                        if download_failures_this_run >= MAX_DOWNLOAD_FAILURES_PER_RUN:
+                            logging.error(
+                                f"{download_failures_this_run} unduhan gagal di run ini. Sisa slot posting tidak diisi."
+                            )
+                            break
+                        continue
+                    download_failed = True
+
+            try:
+                if download_failed:
+                    raise Exception(
+                        f"Gagal mengunduh ulang media {file_unique_id} setelah {config.max_download_attempts} percobaan."
                     )
-                    if redownloaded_path:
-                        media_path = redownloaded_path
-                    else:
-                        raise Exception(f"Gagal mengunduh ulang media {file_unique_id}.")
 
                 # 3. Cek Caption (Kosong / Spam / Siap Posting)
                 logging.info("Memproses caption...")
-                processed_caption = gemini_processor.process_caption(original_caption, GEMINI_API_KEY)
+                processed_caption = gemini_processor.get_precaption(media_info)
+                if processed_caption is not None:
+                    logging.info("Menggunakan caption hasil pre-caption.")
+                else:
+                    processed_caption = gemini_processor.process_caption(original_caption, config.gemini_api_key)
                 logging.info(f"Caption akhir: {processed_caption}")
 
                 # 4. Deteksi Reels / Biasa / Foto
-                is_reel = False
                 if media_type == 'video':
                     logging.info("Menganalisis video untuk deteksi Reels...")
-                    is_reel = video_utils.is_reel(media_path)
+                    # ffprobe baru dijalankan di sini, saat item benar-benar diposting (bukan saat masuk antrean);
+                    # klasifikasi hanya memengaruhi log, notifikasi, dan field is_reel karena unggahan
+                    # video selalu lewat upload_video. Probe dari entri antrean lama tetap dipakai jika ada.
+                    probe = media_info.get('probe') or video_utils.probe_video(media_path)
+                    is_reel, reason = video_utils.classify_reel(probe, config.reel_rules)
                     if is_reel:
-                        logging.info("Video dideteksi sebagai Reels.")
+                        logging.info(f"Video dideteksi sebagai Reels ({reason}).")
                     else:
-                        logging.info("Video dideteksi sebagai Video Reguler.")
+                        logging.info(f"Video dideteksi sebagai Video Reguler ({reason}).")
                 else:
                     logging.info("Media dideteksi sebagai Foto.")
 
                 # 5. Upload ke Facebook
                 logging.info(f"Mengunggah media ke Facebook sebagai {'Reels' if is_reel else media_type.capitalize()}...")
                 
-                if is_reel:
-                    post_id = facebook_uploader.upload_reel(
-                        media_path, processed_caption, FB_ACCESS_TOKEN, FB_PAGE_ID
-                    )
-                elif media_type == 'video':
+                if media_type == 'video':
+                    # Facebook otomatis menjadikan video yang memenuhi syarat sebagai Reels
+                    # (lihat facebook_uploader.upload_video)
                     post_id = facebook_uploader.upload_video(
-                        media_path, processed_caption, FB_ACCESS_TOKEN, FB_PAGE_ID
+                        media_path, processed_caption, config.fb_access_token, config.fb_page_id
                     )
                 elif media_type == 'photo':
                     post_id = facebook_uploader.upload_photo(
-                        media_path, processed_caption, FB_ACCESS_TOKEN, FB_PAGE_ID
+                        media_path, processed_caption, config.fb_access_token, config.fb_page_id
                     )
 
                 if post_id:
                     logging.info(f"Media berhasil diunggah! Post ID: {post_id}")
                     send_telegram_notification(
+                        config,
                         f"✅ Berhasil posting ke Facebook!\n"
                         f"Tipe: {'Reels' if is_reel else media_type.capitalize()}\n"
                         f"Caption: {processed_caption[:100]}...\n"
@@ -218,6 +380,7 @@ def run_autopost():
                 else:
                     logging.error("Gagal mendapatkan Post ID setelah unggah.")
                     send_telegram_notification(
+                        config,
                         f"❌ Gagal posting ke Facebook untuk media ID unik: {file_unique_id}. Post ID tidak ditemukan."
                     )
                     post_status = 'failed_upload'
@@ -225,6 +388,7 @@ def run_autopost():
             except Exception as e:
                 logging.error(f"Terjadi kesalahan saat mengunggah media {file_unique_id}: {e}", exc_info=True)
                 send_telegram_notification(
+                    config,
                     f"❌ Terjadi kesalahan saat posting ke Facebook untuk media ID unik: {file_unique_id}.\n"
                     f"Kesalahan: {str(e)[:200]}..."
                 )
@@ -245,22 +409,71 @@ def run_autopost():
                 processed_ids_this_run.append(file_unique_id)
 
                 # 6. Cleanup: Hapus file lokal setelah selesai
-                if os.path.exists(media_path):
-                    os.remove(media_path)
-                    logging.info(f"File lokal dihapus: {media_path}")
+                if media_path:
+                    media_cache.remove(media_path)
 
         # Hapus media yang berhasil/gagal diproses dari antrean
         pending_media_queue = [item for item in pending_media_queue if item['file_unique_id'] not in processed_ids_this_run]
+        if precaption_job:
+            finish_precaption(*precaption_job, pending_media_queue)
         save_json_file(PENDING_MEDIA_FILE, pending_media_queue)
 
         logging.info(f"Siklus AutoPost selesai. Offset update terakhir disimpan: {new_max_offset_seen}")
-        send_telegram_notification("✅ Siklus AutoPost Facebook Reels selesai.")
+        send_telegram_notification(config, "✅ Siklus AutoPost Facebook Reels selesai.")
 
     except Exception as e:
         logging.error(f"Terjadi kesalahan fatal dalam siklus AutoPost: {e}", exc_info=True)
         send_telegram_notification(
+            config,
             f"❌ Terjadi kesalahan fatal dalam siklus AutoPost Facebook Reels: {str(e)[:200]}..."
         )
 
+def _report_startup_profile(startup_seconds):
+    """Mencatat waktu startup dan waktu impor per modul (untuk --profile-startup)."""
+    logging.info(f"[profile-startup] Startup hingga siklus dimulai: {startup_seconds * 1000:.1f} ms")
+    for module_name, seconds in sorted(_import_timings.items(), key=lambda item: item[1], reverse=True):
+        logging.info(f"[profile-startup] Impor {module_name}: {seconds * 1000:.1f} ms")
+    logging.info(f"[profile-startup] Total durasi proses: {(time.perf_counter() - _PROCESS_START) * 1000:.1f} ms")
+
+def _notify_config_error(error):
+    """Mengirim notifikasi kegagalan konfigurasi jika token bot dan chat ID Telegram masih bisa dipakai."""
+    bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
+    chat_id = os.getenv('TELEGRAM_CHAT_ID', '')
+    if not bot_token or not chat_id.lstrip('-').isdigit():
+        return
+    try:
+        telegram_fetcher = _import_stage('telegram_fetcher')
+        # Pesan error ditulis sebagai code span: nama variabel seperti MAX_POSTS_PER_RUN berisi '_'
+        # yang merusak parse_mode Markdown. Backtick di dalam pesan diganti agar code span tidak terputus.
+        error_text = str(error).replace('`', "'")
+        telegram_fetcher.send_message(
+            bot_token, int(chat_id), f"❌ Gagal: Konfigurasi AutoPost Facebook tidak valid.\n`{error_text}`"
+        )
+    except Exception as e:
+        logging.error(f"Gagal mengirim notifikasi Telegram: {e}")
+
+def main(argv=None):
+    """Titik masuk CLI: mengatur logging, memvalidasi konfigurasi, lalu menjalankan satu siklus."""
+    parser = argparse.ArgumentParser(description="AutoPost Facebook Reels dari Telegram.")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="Laporkan waktu startup dan waktu impor tiap modul.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    try:
+        config = load_config()
+    except ConfigError as e:
+        logging.error(f"Konfigurasi tidak valid: {e}")
+        _notify_config_error(e)
+        return 1
+
+    startup_seconds = time.perf_counter() - _PROCESS_START
+    run_autopost(config)
+
+    if args.profile_startup:
+        _report_startup_profile(startup_seconds)
+    return 0
+
 if __name__ == "__main__":
-    run_autopost()
+    sys.exit(main())
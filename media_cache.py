@@ -0,0 +1,203 @@
+import os
+import re
+import time
+import shutil
+import logging
+
+# --- Konfigurasi Cache Media ---
+# Semua media hasil unduhan disimpan di direktori ini (bukan di direktori kerja) dan dibatasi ukurannya.
+# Nilai default; main.py menimpanya lewat configure() dengan nilai dari config.Config.
+MEDIA_CACHE_DIR = 'media_cache'
+MEDIA_CACHE_MAX_BYTES = 1024 * 1024 * 1024 # 1 GB
+# Jumlah item teratas di antrean (yang akan segera diposting) yang tidak boleh di-evict
+MEDIA_CACHE_PIN_COUNT = 5
+
+PARTIAL_SUFFIXES = ('.part', '.part.json')
+
+# File penanda yang dibuat ensure_cache_dir() di direktori cache baru. Direktori tanpa penanda
+# (misalnya MEDIA_CACHE_DIR diarahkan ke direktori yang sudah ada) tidak pernah dibersihkan.
+CACHE_MARKER_FILE = '.autopost_media_cache'
+# Hanya file dengan pola nama cache yang dianggap milik cache: <file_unique_id>.<ext>[.part[.json]]
+CACHE_FILENAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]+\.[A-Za-z0-9]+(\.part(\.json)?)?$')
+
+
+def configure(cache_dir=None, max_bytes=None, pin_count=None):
+    """Menerapkan lokasi, batas ukuran, dan jumlah pin cache media dari config.Config."""
+    global MEDIA_CACHE_DIR, MEDIA_CACHE_MAX_BYTES, MEDIA_CACHE_PIN_COUNT
+    if cache_dir is not None:
+        MEDIA_CACHE_DIR = cache_dir
+    if max_bytes is not None:
+        MEDIA_CACHE_MAX_BYTES = max_bytes
+    if pin_count is not None:
+        MEDIA_CACHE_PIN_COUNT = pin_count
+
+
+def ensure_cache_dir():
+    """
+    Membuat direktori cache jika belum ada. Penanda cache hanya ditulis ke direktori yang masih kosong,
+    jadi direktori lain yang kebetulan dipakai sebagai MEDIA_CACHE_DIR tidak akan dianggap cache.
+    """
+    os.makedirs(MEDIA_CACHE_DIR, exist_ok=True)
+    marker_path = os.path.join(MEDIA_CACHE_DIR, CACHE_MARKER_FILE)
+    if not os.path.exists(marker_path) and not os.listdir(MEDIA_CACHE_DIR):
+        open(marker_path, 'w').close()
+    return MEDIA_CACHE_DIR
+
+
+def is_managed():
+    """True jika MEDIA_CACHE_DIR memiliki penanda cache, sehingga isinya boleh dihapus."""
+    return os.path.isfile(os.path.join(MEDIA_CACHE_DIR, CACHE_MARKER_FILE))
+
+
+def cache_path(filename):
+    """Mengembalikan path lengkap di dalam direktori cache untuk nama file tertentu."""
+    return os.path.join(ensure_cache_dir(), filename)
+
+
+def _unique_id_of(filename):
+    """Mengambil file_unique_id dari nama file cache (<file_unique_id>.<ext>[.part])."""
+    return filename.split('.', 1)[0]
+
+
+def _is_partial(filename):
+    return filename.endswith(PARTIAL_SUFFIXES)
+
+
+def _is_cache_filename(filename):
+    return CACHE_FILENAME_PATTERN.match(filename) is not None
+
+
+def find_cached(file_unique_id):
+    """Mengembalikan path file lengkap (bukan parsial) untuk file_unique_id di cache, atau None."""
+    if not os.path.isdir(MEDIA_CACHE_DIR):
+        return None
+    for filename in os.listdir(MEDIA_CACHE_DIR):
+        if _is_cache_filename(filename) and _unique_id_of(filename) == file_unique_id \
+                and not _is_partial(filename):
+            return os.path.join(MEDIA_CACHE_DIR, filename)
+    return None
+
+
+def touch(path):
+    """
+    Menandai file sebagai baru diakses untuk urutan LRU.
+    Hanya atime yang diubah agar mtime (dipakai cache probe video) tetap sama.
+    """
+    try:
+        stat = os.stat(path)
+        os.utime(path, (time.time(), stat.st_mtime))
+    except OSError:
+        pass
+
+
+def remove(path):
+    """Menghapus file dari cache beserta sisa unduhan parsialnya."""
+    for candidate in (path, f"{path}.part", f"{path}.part.json"):
+        if os.path.exists(candidate):
+            os.remove(candidate)
+            logging.info(f"File cache dihapus: {candidate}")
+
+
+def _list_entries():
+    """
+    Mengembalikan daftar (path, file_unique_id, ukuran, atime) untuk file cache.
+    Hanya file berpola nama cache di direktori yang memiliki penanda; selain itu daftar kosong,
+    sehingga reconcile() dan enforce_budget() tidak pernah menghapus file lain.
+    """
+    if not os.path.isdir(MEDIA_CACHE_DIR) or not is_managed():
+        return []
+    entries = []
+    for filename in os.listdir(MEDIA_CACHE_DIR):
+        path = os.path.join(MEDIA_CACHE_DIR, filename)
+        if not _is_cache_filename(filename) or not os.path.isfile(path):
+            continue
+        stat = os.stat(path)
+        entries.append((path, _unique_id_of(filename), stat.st_size, stat.st_atime))
+    return entries
+
+
+def budget_headroom(max_bytes=None):
+    """Sisa byte yang masih muat di cache sebelum enforce_budget() mulai meng-evict."""
+    max_bytes = MEDIA_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    return max(max_bytes - sum(size for _, _, size, _ in _list_entries()), 0)
+
+
+def reconcile(pending_media_queue):
+    """
+    Menyelaraskan isi cache dengan antrean saat startup:
+    - file lama di luar cache (misalnya di direktori kerja) dipindahkan ke cache,
+    - file_path item antrean diarahkan ke file di cache, atau None jika belum diunduh,
+    - file (dan unduhan parsial) yang tidak lagi ada di antrean dihapus.
+    """
+    ensure_cache_dir()
+    if not is_managed():
+        logging.warning(
+            f"Direktori cache {os.path.abspath(MEDIA_CACHE_DIR)} tidak kosong dan tidak memiliki penanda "
+            f"{CACHE_MARKER_FILE}. Isinya tidak akan dibersihkan; gunakan direktori kosong untuk MEDIA_CACHE_DIR."
+        )
+    queued_ids = set()
+    for media_info in pending_media_queue:
+        file_unique_id = media_info['file_unique_id']
+        queued_ids.add(file_unique_id)
+        legacy_path = media_info.get('file_path')
+
+        if legacy_path and os.path.exists(legacy_path) and \
+                os.path.dirname(os.path.abspath(legacy_path)) != os.path.abspath(MEDIA_CACHE_DIR):
+            target = cache_path(os.path.basename(legacy_path))
+            shutil.move(legacy_path, target)
+            logging.info(f"Memindahkan media lama {legacy_path} ke cache: {target}")
+
+        media_info['file_path'] = find_cached(file_unique_id)
+
+    orphan_count = 0
+    for path, file_unique_id, _, _ in _list_entries():
+        if file_unique_id not in queued_ids:
+            os.remove(path)
+            orphan_count += 1
+    if orphan_count:
+        logging.info(f"Menghapus {orphan_count} file cache yang tidak ada di antrean.")
+
+
+def enforce_budget(queued_ids_in_order, pin_count=None, max_bytes=None):
+    """
+    Meng-evict file sampai total ukuran cache <= max_bytes.
+    queued_ids_in_order adalah file_unique_id antrean, urut dari yang paling dulu akan diposting.
+    Urutan eviction: file di luar antrean (LRU), lalu item antrean yang paling jauh dari giliran posting.
+    pin_count item teratas tidak pernah di-evict.
+    Default pin_count dan max_bytes diambil dari configure().
+    Mengembalikan daftar file_unique_id yang di-evict.
+    """
+    pin_count = MEDIA_CACHE_PIN_COUNT if pin_count is None else pin_count
+    max_bytes = MEDIA_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = _list_entries()
+    total_bytes = sum(size for _, _, size, _ in entries)
+    if total_bytes <= max_bytes:
+        return []
+
+    queue_rank = {file_unique_id: rank for rank, file_unique_id in enumerate(queued_ids_in_order)}
+    pinned_ids = set(queued_ids_in_order[:pin_count])
+
+    def eviction_order(entry):
+        _, file_unique_id, _, atime = entry
+        if file_unique_id not in queue_rank:
+            return (0, 0, atime) # Tidak di antrean: evict duluan, yang paling lama tidak diakses
+        return (1, -queue_rank[file_unique_id], atime) # Paling jauh dari giliran posting duluan
+
+    evicted_ids = []
+    for path, file_unique_id, size, _ in sorted(entries, key=eviction_order):
+        if total_bytes <= max_bytes:
+            break
+        if file_unique_id in pinned_ids:
+            continue
+        os.remove(path)
+        total_bytes -= size
+        if file_unique_id not in evicted_ids:
+            evicted_ids.append(file_unique_id)
+
+    logging.info(
+        f"Cache media melebihi batas {max_bytes} byte. Evict {len(evicted_ids)} item, "
+        f"sisa {total_bytes} byte."
+    )
+    if total_bytes > max_bytes:
+        logging.warning("Cache media masih melebihi batas karena sisa file di-pin untuk posting berikutnya.")
+    return evicted_ids
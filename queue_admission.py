@@ -0,0 +1,100 @@
+import os
+import re
+import json
+import logging
+from datetime import datetime
+
+# Kebijakan saat antrean melebihi batas:
+# - 'drop_oldest'          : buang item dengan update_id terkecil
+# - 'drop_lowest_priority' : buang item dengan 'priority' terendah (lalu update_id terkecil)
+# - 'spill'                : seperti drop_oldest, tetapi item dipindahkan ke file arsip dingin
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_lowest_priority', 'spill')
+
+# Prioritas diambil dari tag di caption Telegram saat media masuk antrean:
+# '#prioritas' (atau '#priority') = 1, '#prioritas=N' / '#prioritas:N' = N. Tanpa tag = 0.
+PRIORITY_TAG_PATTERN = re.compile(r'#(?:prioritas|priority)(?:[:=](-?\d+))?\b', re.IGNORECASE)
+
+
+def priority_from_caption(caption):
+    """Mengembalikan prioritas item dari tag di caption (0 jika tidak ada tag)."""
+    match = PRIORITY_TAG_PATTERN.search(caption or '')
+    if not match:
+        return 0
+    return int(match.group(1)) if match.group(1) else 1
+
+
+def item_bytes(media_info):
+    """Ukuran media dalam byte menurut metadata Telegram (0 jika tidak diketahui)."""
+    return media_info.get('file_size') or 0
+
+
+def queue_bytes(pending_media_queue):
+    """Total ukuran semua media di antrean, termasuk yang belum diunduh."""
+    return sum(item_bytes(item) for item in pending_media_queue)
+
+
+def download_headroom(pending_media_queue, max_length, max_bytes):
+    """
+    Menghitung berapa item dan berapa byte yang masih boleh diunduh sebelum antrean jenuh.
+    Batas 0 berarti tidak dibatasi (dikembalikan sebagai None).
+    """
+    item_headroom = max(max_length - len(pending_media_queue), 0) if max_length else None
+    byte_headroom = max(max_bytes - queue_bytes(pending_media_queue), 0) if max_bytes else None
+    return item_headroom, byte_headroom
+
+
+def _is_over_limit(pending_media_queue, max_length, max_bytes):
+    if max_length and len(pending_media_queue) > max_length:
+        return True
+    if max_bytes and queue_bytes(pending_media_queue) > max_bytes:
+        return True
+    return False
+
+
+def _victim_key(policy):
+    """Kunci urut untuk memilih item yang dikeluarkan (nilai terkecil dikeluarkan duluan)."""
+    if policy == 'drop_lowest_priority':
+        return lambda item: (item.get('priority', 0), item['update_id'])
+    return lambda item: item['update_id']
+
+
+def spill_to_archive(archive_path, media_items):
+    """Menambahkan item ke file arsip JSON Lines (append-only, tidak pernah dimuat ulang tiap run)."""
+    archived_at = datetime.now().isoformat()
+    with open(archive_path, 'a') as f:
+        for media_info in media_items:
+            f.write(json.dumps(dict(media_info, archived_at=archived_at), ensure_ascii=False) + '\n')
+    logging.info(f"{len(media_items)} item dipindahkan ke arsip: {os.path.abspath(archive_path)}")
+
+
+def admit(pending_media_queue, max_length, max_bytes, policy, archive_path):
+    """
+    Menegakkan batas panjang dan ukuran antrean setelah item baru ditambahkan.
+    Item dikeluarkan sesuai kebijakan overflow sampai antrean kembali di bawah batas.
+    Mengembalikan (antrean_baru, item_yang_dikeluarkan).
+    """
+    if not _is_over_limit(pending_media_queue, max_length, max_bytes):
+        return pending_media_queue, []
+
+    # Urutkan sekali: item yang paling layak dikeluarkan ada di depan
+    ordered = sorted(pending_media_queue, key=_victim_key(policy))
+    total_bytes = queue_bytes(ordered)
+    cut = 0
+    while cut < len(ordered) and (
+        (max_length and len(ordered) - cut > max_length)
+        or (max_bytes and total_bytes > max_bytes)
+    ):
+        total_bytes -= item_bytes(ordered[cut])
+        cut += 1
+
+    overflow = ordered[:cut]
+    overflow_ids = {item['file_unique_id'] for item in overflow}
+    remaining = [item for item in pending_media_queue if item['file_unique_id'] not in overflow_ids]
+
+    if policy == 'spill':
+        spill_to_archive(archive_path, overflow)
+    logging.warning(
+        f"Antrean melebihi batas ({max_length or '-'} item, {max_bytes or '-'} byte). "
+        f"{len(overflow)} item dikeluarkan dengan kebijakan '{policy}'."
+    )
+    return remaining, overflow
@@ -0,0 +1,219 @@
+import os
+import json
+import zlib
+import sqlite3
+import dbm
+import logging
+
+# --- Backend State ---
+# 'json'   : perilaku lama, satu file JSON per state
+# 'sqlite' : satu file SQLite ringkas (cocok untuk artifact/cache CI)
+# 'dbm'    : penyimpanan key-value lokal bawaan Python (pengganti Redis/KV sederhana)
+# Backend dipilih lewat configure(); nilainya berasal dari config.Config.
+
+# --- Kebijakan Retensi ---
+# Jumlah maksimum entri di posted_media yang disimpan. Entri terlama (berdasarkan
+# posted_at) dipangkas agar ukuran state tidak tumbuh tanpa batas. 0 = tidak dipangkas.
+DEFAULT_POSTED_MEDIA_MAX_ENTRIES = 2000
+
+
+def _encode(data):
+    """Serialisasi data ke JSON ringkas lalu kompres dengan zlib."""
+    raw = json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return zlib.compress(raw, 9)
+
+
+def _decode(blob):
+    """Kebalikan dari _encode."""
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+def _state_key(name):
+    """Nama kunci state diambil dari nama file lama (tanpa direktori)."""
+    return os.path.basename(name)
+
+
+def _load_legacy_file(name):
+    """
+    Membaca file state lama (JSON atau teks offset) jika ada.
+    Dipakai sekali saat migrasi dari backend 'json' ke backend lain.
+    """
+    if not os.path.exists(name):
+        return None
+    with open(name, 'r') as f:
+        content = f.read().strip()
+    if not content:
+        return None
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        logging.warning(f"File lama {name} tidak dapat diurai. Melewatkan migrasi.")
+        return None
+
+
+class JsonFileBackend:
+    """Backend lama: setiap state disimpan sebagai file JSON terpisah."""
+    name = 'json'
+
+    def load(self, name, default):
+        if os.path.exists(name):
+            with open(name, 'r') as f:
+                try:
+                    data = json.load(f)
+                    logging.info(f"Memuat data dari: {os.path.abspath(name)}")
+                    return data
+                except json.JSONDecodeError:
+                    logging.warning(f"File {name} rusak atau kosong. Membuat yang baru.")
+                    return default
+        logging.info(f"File {name} tidak ditemukan. Membuat yang baru.")
+        return default
+
+    def save(self, name, data):
+        with open(name, 'w') as f:
+            json.dump(data, f, indent=4)
+        logging.info(f"Data disimpan ke: {os.path.abspath(name)}")
+
+
+class SqliteBackend:
+    """
+    Backend SQLite: semua state disimpan dalam satu file database kecil.
+    Nilai disimpan sebagai JSON terkompresi (BLOB) agar ukurannya ringkas.
+    """
+    name = 'sqlite'
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or 'autopost_state.db'
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value BLOB NOT NULL)"
+        )
+        self.conn.commit()
+
+    def load(self, name, default):
+        key = _state_key(name)
+        row = self.conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            try:
+                data = _decode(row[0])
+                logging.info(f"Memuat state '{key}' dari: {os.path.abspath(self.db_path)}")
+                return data
+            except (zlib.error, ValueError):
+                logging.warning(f"State '{key}' di {self.db_path} rusak. Membuat yang baru.")
+                return default
+
+        legacy = _load_legacy_file(name)
+        if legacy is not None:
+            logging.warning(
+                f"State '{key}' tidak ada di {self.db_path}; migrasi dari file lama {name}. "
+                f"Jika database state hilang (misalnya cache CI kosong), isi file ini mungkin sudah usang."
+            )
+            self.save(name, legacy)
+            return legacy
+        logging.info(f"State '{key}' tidak ditemukan di {self.db_path}. Membuat yang baru.")
+        return default
+
+    def save(self, name, data):
+        key = _state_key(name)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+            (key, sqlite3.Binary(_encode(data)))
+        )
+        self.conn.commit()
+        logging.info(f"State '{key}' disimpan ke: {os.path.abspath(self.db_path)}")
+
+
+class DbmBackend:
+    """
+    Backend key-value lokal menggunakan modul dbm bawaan Python.
+    Berguna sebagai pengganti sederhana untuk penyimpanan KV eksternal.
+    """
+    name = 'dbm'
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or 'autopost_state.kv'
+
+    def load(self, name, default):
+        key = _state_key(name)
+        with dbm.open(self.db_path, 'c') as db:
+            blob = db.get(key)
+        if blob is not None:
+            try:
+                data = _decode(blob)
+                logging.info(f"Memuat state '{key}' dari: {os.path.abspath(self.db_path)}")
+                return data
+            except (zlib.error, ValueError):
+                logging.warning(f"State '{key}' di {self.db_path} rusak. Membuat yang baru.")
+                return default
+
+        legacy = _load_legacy_file(name)
+        if legacy is not None:
+            logging.warning(
+                f"State '{key}' tidak ada di {self.db_path}; migrasi dari file lama {name}. "
+                f"Jika database state hilang (misalnya cache CI kosong), isi file ini mungkin sudah usang."
+            )
+            self.save(name, legacy)
+            return legacy
+        logging.info(f"State '{key}' tidak ditemukan di {self.db_path}. Membuat yang baru.")
+        return default
+
+    def save(self, name, data):
+        key = _state_key(name)
+        with dbm.open(self.db_path, 'c') as db:
+            db[key] = _encode(data)
+        logging.info(f"State '{key}' disimpan ke: {os.path.abspath(self.db_path)}")
+
+
+_BACKENDS = {
+    'json': JsonFileBackend,
+    'sqlite': SqliteBackend,
+    'dbm': DbmBackend,
+}
+
+STATE_BACKENDS = tuple(_BACKENDS)
+
+_backend_instance = None
+_posted_media_max_entries = DEFAULT_POSTED_MEDIA_MAX_ENTRIES
+
+
+def configure(backend_name='json', db_path=None, posted_media_max_entries=DEFAULT_POSTED_MEDIA_MAX_ENTRIES):
+    """
+    Memilih backend state dan kebijakan retensi untuk proses ini.
+    db_path kosong berarti backend memakai nama file default-nya sendiri.
+    """
+    global _backend_instance, _posted_media_max_entries
+    backend_cls = _BACKENDS[backend_name]
+    _backend_instance = backend_cls() if backend_cls is JsonFileBackend else backend_cls(db_path)
+    _posted_media_max_entries = posted_media_max_entries
+    logging.info(f"Menggunakan backend state: {_backend_instance.name}")
+    return _backend_instance
+
+
+def get_backend():
+    """Mengembalikan backend state aktif (default 'json' jika configure() belum dipanggil)."""
+    if _backend_instance is None:
+        return configure()
+    return _backend_instance
+
+
+def prune_posted_media(posted_media, max_entries=None):
+    """
+    Memangkas ledger posted_media agar berisi paling banyak max_entries entri terbaru
+    (default: nilai dari configure()). max_entries <= 0 berarti tidak dipangkas.
+    Entri diurutkan berdasarkan 'posted_at'; entri tanpa tanggal dianggap paling lama.
+    Mengembalikan jumlah entri yang dihapus.
+    """
+    if max_entries is None:
+        max_entries = _posted_media_max_entries
+    # Batas 0 (atau negatif) berarti tidak dipangkas, bukan menghapus seluruh ledger
+    if max_entries <= 0 or len(posted_media) <= max_entries:
+        return 0
+
+    ordered_ids = sorted(
+        posted_media,
+        key=lambda media_id: posted_media[media_id].get('posted_at') or ''
+    )
+    excess_ids = ordered_ids[:len(posted_media) - max_entries]
+    for media_id in excess_ids:
+        del posted_media[media_id]
+    logging.info(f"Memangkas {len(excess_ids)} entri lama dari posted_media (batas {max_entries}).")
+    return len(excess_ids)
@@ -1,10 +1,60 @@
 import requests
 import os
+import json
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse
 
-# Konfigurasi logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+import media_cache
+import queue_admission
+
+# --- Konfigurasi Unduhan ---
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024 # 1 MB per potongan tulis
+# Nilai default; main.py menimpanya lewat configure() dengan nilai dari config.Config
+DOWNLOAD_PART_SIZE = 2 * 1024 * 1024 # Ukuran tiap Range request
+DOWNLOAD_PARALLEL_THRESHOLD = 4 * 1024 * 1024 # File >= ini diunduh paralel
+DOWNLOAD_WORKERS = 4
+DOWNLOAD_MAX_RETRIES = 3
+# (connect, read): timeout berlaku per operasi baca, bukan untuk seluruh transfer
+DOWNLOAD_TIMEOUT = (10, 60)
+
+# --- Konfigurasi getUpdates ---
+# Timeout long poll getUpdates (detik). 0 = short poll: untuk cron, update yang menumpuk sudah tersedia
+# dan menunggu update baru hanya membuat siklus tanpa update tertahan selama timeout.
+GET_UPDATES_POLL_TIMEOUT = 0
+# Timeout HTTP untuk sendMessage (connect, read)
+SEND_MESSAGE_TIMEOUT = (10, 20)
+
+# --- Cache Metadata getFile ---
+# Cache hanya hidup selama satu proses (tidak disimpan antar run): jadwal cron 6 jam jauh melebihi
+# masa berlaku link. Gunanya agar prefetch paralel dan unduhan dalam run yang sama tidak memanggil
+# getFile dua kali. Telegram menjamin link file berlaku minimal 1 jam; simpan sedikit di bawahnya.
+FILE_INFO_CACHE_TTL = 3300
+FILE_INFO_PREFETCH_WORKERS = 4
+
+# file_id -> {'file_path': ..., 'file_size': ..., 'fetched_at': ...}
+_file_info_cache = {}
+
+
+class StaleLinkError(Exception):
+    """URL file Telegram ditolak dengan status 4xx; link hasil getFile kemungkinan sudah kedaluwarsa."""
+
+def configure(download_part_size=None, download_parallel_threshold=None, download_workers=None,
+              file_info_cache_ttl=None, poll_timeout=None):
+    """Menerapkan pengaturan unduhan, cache getFile, dan long poll getUpdates dari config.Config."""
+    global DOWNLOAD_PART_SIZE, DOWNLOAD_PARALLEL_THRESHOLD, DOWNLOAD_WORKERS, FILE_INFO_CACHE_TTL
+    global GET_UPDATES_POLL_TIMEOUT
+    if download_part_size is not None:
+        DOWNLOAD_PART_SIZE = download_part_size
+    if download_parallel_threshold is not None:
+        DOWNLOAD_PARALLEL_THRESHOLD = download_parallel_threshold
+    if download_workers is not None:
+        DOWNLOAD_WORKERS = download_workers
+    if file_info_cache_ttl is not None:
+        FILE_INFO_CACHE_TTL = file_info_cache_ttl
+    if poll_timeout is not None:
+        GET_UPDATES_POLL_TIMEOUT = poll_timeout
 
 def send_message(bot_token, chat_id, text):
     """Mengirim pesan teks ke chat Telegram tertentu."""
@@ -15,30 +65,39 @@ def send_message(bot_token, chat_id, text):
         'parse_mode': 'Markdown'
     }
     try:
-        response = requests.post(url, json=payload)
+        response = requests.post(url, json=payload, timeout=SEND_MESSAGE_TIMEOUT)
         response.raise_for_status() # Akan memunculkan HTTPError untuk kode status 4xx/5xx
         return response.json()
     except requests.exceptions.RequestException as e:
         logging.error(f"Gagal mengirim pesan Telegram: {e}")
         raise
 
-def fetch_new_media(bot_token, target_chat_id, last_offset, posted_media_ids):
+def _exceeds_limit(count, total_bytes, max_count, max_bytes):
+    """True jika count atau total_bytes melewati batas (None berarti tidak dibatasi)."""
+    return (max_count is not None and count > max_count) or (max_bytes is not None and total_bytes > max_bytes)
+
+def fetch_new_media(bot_token, target_chat_id, last_offset, posted_media_ids,
+                    download_limit=None, download_bytes_limit=None, eager_limit=None, eager_bytes_limit=None):
     """
     Mengambil update terbaru dari Telegram dan mengunduh media.
     Mengembalikan semua media baru yang ditemukan (terurut terbaru ke terlama).
+    download_limit/download_bytes_limit adalah sisa kapasitas antrean; eager_limit/eager_bytes_limit
+    membatasi unduhan langsung (jendela pin dan sisa anggaran cache media). Media di luar batas
+    dikembalikan tanpa diunduh (file_path None) dan akan diunduh saat gilirannya diposting.
     """
     url = f"https://api.telegram.org/bot{bot_token}/getUpdates"
     params = {
         'offset': last_offset + 1, # Mulai dari update setelah yang terakhir diproses
         'limit': 50, # Ambil hingga 50 update
-        'timeout': 30 # Timeout untuk permintaan
+        'timeout': GET_UPDATES_POLL_TIMEOUT # Long poll (detik); 0 = langsung kembali jika tidak ada update
     }
     
     new_media_updates_list = []
+    found_media = []
     current_max_offset = last_offset
     
     try:
-        response = requests.get(url, params=params, timeout=40)
+        response = requests.get(url, params=params, timeout=GET_UPDATES_POLL_TIMEOUT + 10)
         response.raise_for_status() # Angkat HTTPError untuk kode status 4xx/5xx
         updates = response.json().get('result', [])
 
@@ -73,6 +132,7 @@ def fetch_new_media(bot_token, target_chat_id, last_offset, posted_media_ids):
                 width = video.get('width')
                 height = video.get('height')
                 duration = video.get('duration')
+                file_size = video.get('file_size')
                 logging.info(f"Ditemukan video (ID Unik: {file_unique_id})")
             elif 'photo' in message:
                 photo = message['photo'][-1]
@@ -82,29 +142,66 @@ def fetch_new_media(bot_token, target_chat_id, last_offset, posted_media_ids):
                 width = photo.get('width')
                 height = photo.get('height')
                 duration = None
+                file_size = photo.get('file_size')
                 logging.info(f"Ditemukan foto (ID Unik: {file_unique_id})")
             else:
                 logging.debug(f"Melewatkan pesan tanpa video atau foto (ID Update: {update['update_id']}).")
                 continue
+
+            if file_unique_id in posted_media_ids:
+                logging.info(f"Media {file_unique_id} sudah pernah diposting. Tidak diunduh.")
+                continue
             
+            found_media.append({
+                'update_id': update['update_id'],
+                'file_id': file_id,
+                'file_unique_id': file_unique_id,
+                'file_path': None,
+                'type': media_type,
+                'caption': caption,
+                'width': width,
+                'height': height,
+                'duration': duration,
+                'file_size': file_size,
+                'priority': queue_admission.priority_from_caption(caption)
+            })
+
+        # Hanya sebagian media yang diunduh sekarang; sisanya masuk antrean tanpa file (hanya metadata)
+        # dan diunduh saat gilirannya diposting. download_deferred mencatat alasannya:
+        # 'queue' = melebihi sisa kapasitas antrean, 'cache' = di luar jendela pin / sisa anggaran cache.
+        to_download = []
+        cumulative_bytes = 0
+        for position, media_info in enumerate(found_media, start=1):
+            cumulative_bytes += media_info['file_size'] or 0
+            if _exceeds_limit(position, cumulative_bytes, download_limit, download_bytes_limit):
+                media_info['download_deferred'] = 'queue'
+            elif len(to_download) < position - 1 or \
+                    _exceeds_limit(position, cumulative_bytes, eager_limit, eager_bytes_limit):
+                media_info['download_deferred'] = 'cache'
+            else:
+                to_download.append(media_info)
+
+        deferred_media = found_media[len(to_download):]
+        if deferred_media:
+            logging.info(f"{len(deferred_media)} media tidak diunduh sekarang (hanya metadata).")
+            new_media_updates_list.extend(deferred_media)
+
+        # Resolusi getFile untuk semua media sekaligus (paralel) sebelum mengunduh
+        prefetch_file_info(bot_token, [media_info['file_id'] for media_info in to_download])
+
+        for media_info in to_download:
             # Unduh media (file_path akan digunakan nanti oleh main.py jika media ini diproses)
             # Kita unduh di sini agar metadata seperti dimensi bisa langsung didapat
-            file_path = download_telegram_file(bot_token, file_id, file_unique_id, media_type)
+            file_path = download_telegram_file(
+                bot_token, media_info['file_id'], media_info['file_unique_id'], media_info['type']
+            )
             if file_path:
-                media_info = {
-                    'update_id': update['update_id'],
-                    'file_id': file_id,
-                    'file_unique_id': file_unique_id,
-                    'file_path': file_path,
-                    'type': media_type,
-                    'caption': caption,
-                    'width': width,
-                    'height': height,
-                    'duration': duration
-                }
-                new_media_updates_list.append(media_info)
+                media_info['file_path'] = file_path
             else:
-                logging.error(f"Gagal mengunduh media {file_unique_id}. Tidak akan ditambahkan ke daftar.")
+                # Tetap dikembalikan (hanya metadata) karena offset tetap maju; unduhan dilanjutkan
+                # dari file .part saat item ini diproses dari antrean
+                logging.error(f"Gagal mengunduh media {media_info['file_unique_id']}. Ditambahkan tanpa file, akan dicoba lagi nanti.")
+            new_media_updates_list.append(media_info)
 
         return new_media_updates_list, current_max_offset
 
@@ -121,43 +218,267 @@ def fetch_new_media(bot_token, target_chat_id, last_offset, posted_media_ids):
         logging.error(f"Terjadi kesalahan tak terduga saat mengambil update Telegram: {e}", exc_info=True)
         return [], last_offset
 
-def download_telegram_file(bot_token, file_id, file_unique_id, media_type):
-    """Mengunduh file dari Telegram menggunakan file_id."""
+def invalidate_file_info(file_id):
+    """Menghapus entri getFile dari cache (misalnya setelah link gagal diunduh)."""
+    _file_info_cache.pop(file_id, None)
+
+def _request_file_info(bot_token, file_id):
+    """Memanggil getFile dan mengembalikan entri cache, atau None jika info tidak lengkap."""
     get_file_url = f"https://api.telegram.org/bot{bot_token}/getFile?file_id={file_id}"
+    response = requests.get(get_file_url, timeout=10)
+    response.raise_for_status()
+    file_info = response.json().get('result')
+    if not file_info:
+        logging.error(f"Tidak dapat mendapatkan info file untuk file_id: {file_id}")
+        return None
+    if not file_info.get('file_path'):
+        logging.error(f"File path tidak ditemukan untuk file_id: {file_id}")
+        return None
+    return {
+        'file_path': file_info['file_path'],
+        'file_size': file_info.get('file_size'),
+        'fetched_at': time.time()
+    }
+
+def get_file_info(bot_token, file_id):
+    """
+    Mengembalikan (file_path, file_size) untuk file_id, memakai cache jika masih berlaku.
+    Mengembalikan (None, None) jika info file tidak tersedia.
+    """
+    entry = _file_info_cache.get(file_id)
+    if entry and time.time() - entry.get('fetched_at', 0) < FILE_INFO_CACHE_TTL:
+        logging.info(f"Memakai cache getFile untuk file_id: {file_id}")
+        return entry['file_path'], entry.get('file_size')
+
+    entry = _request_file_info(bot_token, file_id)
+    if not entry:
+        return None, None
+    _file_info_cache[file_id] = entry
+    return entry['file_path'], entry.get('file_size')
+
+def prefetch_file_info(bot_token, file_ids):
+    """Menyegarkan cache getFile untuk beberapa file_id sekaligus secara paralel."""
+    now = time.time()
+    missing = [
+        file_id for file_id in dict.fromkeys(file_ids)
+        if now - _file_info_cache.get(file_id, {}).get('fetched_at', 0) >= FILE_INFO_CACHE_TTL
+    ]
+    if not missing:
+        return
+
+    logging.info(f"Mengambil info getFile untuk {len(missing)} file secara paralel...")
+    with ThreadPoolExecutor(max_workers=FILE_INFO_PREFETCH_WORKERS) as executor:
+        futures = {executor.submit(_request_file_info, bot_token, file_id): file_id for file_id in missing}
+        for future in as_completed(futures):
+            file_id = futures[future]
+            try:
+                entry = future.result()
+            except requests.exceptions.RequestException as e:
+                logging.warning(f"Gagal mengambil info getFile untuk {file_id}: {e}")
+                continue
+            if entry:
+                _file_info_cache[file_id] = entry
+
+def _load_download_progress(progress_path, file_size):
+    """Memuat indeks bagian yang sudah selesai dari unduhan parsial sebelumnya."""
+    if not os.path.exists(progress_path):
+        return set()
     try:
-        response = requests.get(get_file_url, timeout=10)
-        response.raise_for_status()
-        file_info = response.json().get('result')
-        if not file_info:
-            logging.error(f"Tidak dapat mendapatkan info file untuk file_id: {file_id}")
-            return None
+        with open(progress_path, 'r') as f:
+            progress = json.load(f)
+        if progress.get('file_size') != file_size:
+            return set()
+        return set(progress.get('done', []))
+    except (json.JSONDecodeError, OSError):
+        return set()
 
-        file_path_tg = file_info.get('file_path')
-        if not file_path_tg:
-            logging.error(f"File path tidak ditemukan untuk file_id: {file_id}")
-            return None
+def _save_download_progress(progress_path, file_size, done_parts):
+    """Menyimpan indeks bagian yang sudah selesai agar unduhan bisa dilanjutkan."""
+    with open(progress_path, 'w') as f:
+        json.dump({'file_size': file_size, 'done': sorted(done_parts)}, f)
 
-        download_url = f"https://api.telegram.org/file/bot{bot_token}/{file_path_tg}"
-        
-        # Tentukan ekstensi file berdasarkan tipe media
-        if media_type == 'video':
-            ext = os.path.splitext(urlparse(file_path_tg).path)[1] or '.mp4'
-        elif media_type == 'photo':
-            ext = os.path.splitext(urlparse(file_path_tg).path)[1] or '.jpg'
-        else:
-            ext = '.bin' # Fallback
-
-        local_filename = f"{file_unique_id}{ext}"
-        
-        logging.info(f"Mengunduh {media_type} dari: {download_url} ke {local_filename}")
-        file_response = requests.get(download_url, stream=True, timeout=60)
-        file_response.raise_for_status()
+def _check_stale_link(response):
+    """Melempar StaleLinkError untuk status 4xx (kecuali 416, yang berarti Range tidak valid)."""
+    if 400 <= response.status_code < 500 and response.status_code != 416:
+        raise StaleLinkError(f"URL file ditolak dengan status {response.status_code}.")
 
-        with open(local_filename, 'wb') as f:
-            for chunk in file_response.iter_content(chunk_size=8192):
+def _download_range(download_url, part_path, start, end):
+    """
+    Mengunduh satu rentang byte [start, end] dan menulisnya langsung ke posisinya di file parsial.
+    Mengembalikan False jika server tidak mendukung Range request.
+    """
+    headers = {'Range': f"bytes={start}-{end}"}
+    with requests.get(download_url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        _check_stale_link(response)
+        response.raise_for_status()
+        if response.status_code != 206:
+            return False
+
+        written = 0
+        with open(part_path, 'r+b') as f:
+            f.seek(start)
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
                 f.write(chunk)
-        logging.info(f"Berhasil mengunduh file: {local_filename}")
-        return local_filename
+                written += len(chunk)
+
+    expected = end - start + 1
+    if written != expected:
+        raise IOError(f"Rentang {start}-{end} tidak lengkap: {written}/{expected} byte.")
+    return True
+
+def _download_parallel(download_url, local_filename, file_size):
+    """
+    Mengunduh file besar dengan beberapa Range request paralel ke file yang sudah dialokasikan.
+    Bagian yang selesai dicatat di file progres sehingga kegagalan bisa dilanjutkan pada run berikutnya.
+    Mengembalikan True jika berhasil, False jika gagal, None jika server tidak mendukung Range.
+    Melempar StaleLinkError (setelah progres disimpan) jika URL ditolak dengan status 4xx.
+    """
+    part_path = f"{local_filename}.part"
+    progress_path = f"{part_path}.json"
+
+    done_parts = set()
+    if os.path.exists(part_path) and os.path.getsize(part_path) == file_size:
+        done_parts = _load_download_progress(progress_path, file_size)
+    if not done_parts:
+        # Alokasikan file seukuran file_size agar setiap worker bisa menulis ke offset-nya sendiri
+        with open(part_path, 'wb') as f:
+            f.truncate(file_size)
+
+    ranges = [
+        (start, min(start + DOWNLOAD_PART_SIZE, file_size) - 1)
+        for start in range(0, file_size, DOWNLOAD_PART_SIZE)
+    ]
+    if done_parts:
+        logging.info(f"Melanjutkan unduhan parsial {local_filename}: {len(done_parts)}/{len(ranges)} bagian sudah ada.")
+
+    for attempt in range(1, DOWNLOAD_MAX_RETRIES + 1):
+        pending = [i for i in range(len(ranges)) if i not in done_parts]
+        if not pending:
+            break
+
+        stale_link_error = None
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+            futures = {
+                executor.submit(_download_range, download_url, part_path, *ranges[i]): i
+                for i in pending
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    if future.result() is False:
+                        logging.warning("Server tidak mendukung Range request. Beralih ke unduhan tunggal.")
+                        return None
+                    done_parts.add(index)
+                except StaleLinkError as e:
+                    stale_link_error = e
+                except (requests.exceptions.RequestException, IOError) as e:
+                    logging.warning(f"Bagian {index} dari {local_filename} gagal (percobaan {attempt}): {e}")
+
+        _save_download_progress(progress_path, file_size, done_parts)
+        if stale_link_error:
+            # Mengulang dengan URL yang sama tidak ada gunanya; pemanggil perlu getFile ulang
+            raise stale_link_error
+
+    if len(done_parts) != len(ranges):
+        logging.error(f"Unduhan {local_filename} belum lengkap ({len(done_parts)}/{len(ranges)} bagian). Akan dilanjutkan nanti.")
+        return False
+
+    if os.path.getsize(part_path) != file_size:
+        logging.error(f"Ukuran file {part_path} tidak sesuai dengan file_size {file_size}.")
+        return False
+
+    os.replace(part_path, local_filename)
+    if os.path.exists(progress_path):
+        os.remove(progress_path)
+    return True
+
+def _download_single(download_url, local_filename, file_size):
+    """
+    Mengunduh file dengan satu stream. Jika ada file parsial, lanjutkan dengan Range request.
+    Mengembalikan True jika berhasil, False jika gagal. Melempar StaleLinkError untuk status 4xx.
+    """
+    part_path = f"{local_filename}.part"
+
+    for attempt in range(1, DOWNLOAD_MAX_RETRIES + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if file_size and offset > file_size:
+            offset = 0
+        headers = {'Range': f"bytes={offset}-"} if offset else {}
+        try:
+            with requests.get(download_url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                _check_stale_link(response)
+                response.raise_for_status()
+                # Server mengabaikan Range (200) -> tulis ulang dari awal
+                mode = 'ab' if offset and response.status_code == 206 else 'wb'
+                with open(part_path, mode) as f:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+        except requests.exceptions.RequestException as e:
+            logging.warning(f"Unduhan {local_filename} terputus (percobaan {attempt}): {e}")
+            continue
+
+        if file_size and os.path.getsize(part_path) != file_size:
+            logging.warning(f"Ukuran {part_path} ({os.path.getsize(part_path)}) tidak sesuai file_size {file_size}. Mencoba lagi.")
+            continue
+
+        os.replace(part_path, local_filename)
+        return True
+
+    logging.error(f"Gagal mengunduh {local_filename} setelah {DOWNLOAD_MAX_RETRIES} percobaan.")
+    return False
+
+def download_telegram_file(bot_token, file_id, file_unique_id, media_type):
+    """
+    Mengunduh file dari Telegram menggunakan file_id.
+    File besar diunduh dengan Range request paralel; ukuran diverifikasi terhadap file_size dari getFile.
+    """
+    # File yang sudah ada di cache media tidak perlu diunduh (atau di-resolve) lagi
+    cached_path = media_cache.find_cached(file_unique_id)
+    if cached_path:
+        logging.info(f"Media {file_unique_id} sudah ada di cache: {cached_path}")
+        media_cache.touch(cached_path)
+        return cached_path
+
+    try:
+        # Link getFile hanya diminta ulang jika URL file ditolak dengan 4xx (link kedaluwarsa);
+        # kegagalan jaringan biasa tidak memicu getFile ulang
+        for link_attempt in range(2):
+            file_path_tg, file_size = get_file_info(bot_token, file_id)
+            if not file_path_tg:
+                return None
+
+            download_url = f"https://api.telegram.org/file/bot{bot_token}/{file_path_tg}"
+
+            # Tentukan ekstensi file berdasarkan tipe media
+            if media_type == 'video':
+                ext = os.path.splitext(urlparse(file_path_tg).path)[1] or '.mp4'
+            elif media_type == 'photo':
+                ext = os.path.splitext(urlparse(file_path_tg).path)[1] or '.jpg'
+            else:
+                ext = '.bin' # Fallback
+
+            # Ditulis ke <nama>.part lalu di-rename, jadi file di cache selalu lengkap
+            local_filename = media_cache.cache_path(f"{file_unique_id}{ext}")
+
+            logging.info(f"Mengunduh {media_type} dari: {download_url} ke {local_filename} ({file_size or '?'} byte)")
+            try:
+                downloaded = None
+                if file_size and file_size >= DOWNLOAD_PARALLEL_THRESHOLD:
+                    downloaded = _download_parallel(download_url, local_filename, file_size)
+                if downloaded is None:
+                    downloaded = _download_single(download_url, local_filename, file_size)
+            except StaleLinkError as e:
+                invalidate_file_info(file_id)
+                if link_attempt == 0:
+                    logging.info(f"{e} Meminta ulang getFile untuk {file_id}.")
+                    continue
+                logging.error(f"Link file {file_id} tetap ditolak setelah getFile ulang: {e}")
+                return None
+
+            if not downloaded:
+                return None
+            logging.info(f"Berhasil mengunduh file: {local_filename}")
+            return local_filename
 
     except requests.exceptions.RequestException as e:
         logging.error(f"Gagal mengunduh file Telegram {file_id}: {e}")
@@ -167,6 +488,8 @@ def download_telegram_file(bot_token, file_id, file_unique_id, media_type):
         return None
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
     # Contoh penggunaan (untuk pengujian lokal)
     # Pastikan Anda memiliki BOT_TOKEN dan CHAT_ID yang valid di lingkungan Anda
     # atau ganti dengan nilai langsung untuk pengujian.
@@ -186,8 +509,8 @@ if __name__ == '__main__':
         logging.info(f"Ditemukan {len(media_list)} media baru.")
         for media in media_list:
             logging.info(f"Tipe: {media['type']}, Path: {media['file_path']}, Caption: {media['caption'][:50]}...")
-            # Hapus file yang diunduh setelah pengujian
-            if os.path.exists(media['file_path']):
+            # Hapus file yang diunduh setelah pengujian (media yang ditunda atau gagal tidak punya file)
+            if media['file_path'] and os.path.exists(media['file_path']):
                 os.remove(media['file_path'])
                 logging.info(f"File pengujian dihapus: {media['file_path']}")
         logging.info(f"Offset terakhir yang diproses: {new_offset}")
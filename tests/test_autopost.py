@@ -0,0 +1,526 @@
+import os
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+import config
+import facebook_uploader
+import gemini_processor
+import main
+import media_cache
+import queue_admission
+import state_store
+import telegram_fetcher
+import video_utils
+from config import ConfigError
+
+
+# Variabel wajib untuk config.load_config() dalam test
+REQUIRED_ENV = {
+    'FB_ACCESS_TOKEN': 'fb-token',
+    'FB_PAGE_ID': '123',
+    'GEMINI_API_KEY': 'gemini-key',
+    'TELEGRAM_BOT_TOKEN': 'bot-token',
+    'TELEGRAM_CHAT_ID': '-100',
+}
+
+
+# --- Server Range palsu untuk telegram_fetcher._download_parallel ---
+
+PAYLOAD = os.urandom(300 * 1024 + 123)
+PART_SIZE = 64 * 1024
+
+
+class _RangeHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        range_header = self.headers.get('Range')
+        if not range_header or not server.supports_range:
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(PAYLOAD)))
+            self.end_headers()
+            self.wfile.write(PAYLOAD)
+            return
+
+        start, end = range_header.split('=')[1].split('-')
+        start = int(start)
+        end = int(end) if end else len(PAYLOAD) - 1
+        server.requested_starts.append(start)
+        if start in server.failing_starts:
+            self.send_response(500)
+            self.end_headers()
+            return
+
+        body = PAYLOAD[start:end + 1]
+        self.send_response(206)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def range_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _RangeHandler)
+    server.supports_range = True
+    server.failing_starts = set()
+    server.requested_starts = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/file.mp4"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def small_parts(monkeypatch):
+    monkeypatch.setattr(telegram_fetcher, 'DOWNLOAD_PART_SIZE', PART_SIZE)
+    monkeypatch.setattr(telegram_fetcher, 'DOWNLOAD_MAX_RETRIES', 1)
+
+
+def test_download_parallel_assembles_file(range_server, small_parts, tmp_path):
+    target = str(tmp_path / 'media.mp4')
+
+    assert telegram_fetcher._download_parallel(range_server.url, target, len(PAYLOAD)) is True
+
+    with open(target, 'rb') as f:
+        assert f.read() == PAYLOAD
+    assert not os.path.exists(f"{target}.part")
+    assert not os.path.exists(f"{target}.part.json")
+
+
+def test_download_parallel_resumes_only_missing_parts(range_server, small_parts, tmp_path):
+    target = str(tmp_path / 'media.mp4')
+    range_server.failing_starts = {PART_SIZE}
+
+    assert telegram_fetcher._download_parallel(range_server.url, target, len(PAYLOAD)) is False
+    with open(f"{target}.part.json") as f:
+        progress = json.load(f)
+    assert 1 not in progress['done']
+
+    range_server.failing_starts = set()
+    range_server.requested_starts.clear()
+    assert telegram_fetcher._download_parallel(range_server.url, target, len(PAYLOAD)) is True
+
+    assert range_server.requested_starts == [PART_SIZE]
+    with open(target, 'rb') as f:
+        assert f.read() == PAYLOAD
+
+
+def test_download_parallel_without_range_support(range_server, small_parts, tmp_path):
+    range_server.supports_range = False
+    target = str(tmp_path / 'media.mp4')
+
+    assert telegram_fetcher._download_parallel(range_server.url, target, len(PAYLOAD)) is None
+
+
+class _FakeUpdatesResponse:
+    def __init__(self, updates):
+        self.updates = updates
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {'result': self.updates}
+
+
+def test_fetch_new_media_downloads_only_eager_window(monkeypatch):
+    updates = [
+        {'update_id': update_id, 'message': {
+            'chat': {'id': -1},
+            'photo': [{'file_id': f"f{update_id}", 'file_unique_id': f"u{update_id}", 'file_size': 1000}],
+        }}
+        for update_id in range(1, 11)
+    ]
+    downloaded = []
+    monkeypatch.setattr(telegram_fetcher.requests, 'get', lambda *args, **kwargs: _FakeUpdatesResponse(updates))
+    monkeypatch.setattr(telegram_fetcher, 'prefetch_file_info', lambda bot_token, file_ids: None)
+    monkeypatch.setattr(
+        telegram_fetcher, 'download_telegram_file',
+        lambda bot_token, file_id, file_unique_id, media_type: downloaded.append(file_unique_id) or f"{file_unique_id}.jpg"
+    )
+
+    media, offset = telegram_fetcher.fetch_new_media(
+        'token', -1, 0, {}, download_limit=8, eager_limit=5, eager_bytes_limit=3000
+    )
+
+    assert offset == 10
+    assert downloaded == ['u10', 'u9', 'u8']
+    deferred = {item['file_unique_id']: item['download_deferred'] for item in media if 'download_deferred' in item}
+    assert deferred == {'u7': 'cache', 'u6': 'cache', 'u5': 'cache', 'u4': 'cache', 'u3': 'cache',
+                        'u2': 'queue', 'u1': 'queue'}
+    assert all(item['file_path'] is None for item in media if item['file_unique_id'] in deferred)
+
+
+# --- video_utils.classify_reels ---
+
+def _record(width, height, duration=30.0, rotation=0):
+    return {'width': width, 'height': height, 'duration': duration, 'rotation': rotation}
+
+
+def test_classify_reels_default_rules():
+    results = video_utils.classify_reels([
+        _record(1080, 1920),                 # 9:16
+        _record(1080, 1350),                 # 4:5
+        _record(1920, 1080),                 # 16:9
+        _record(1080, 1920, duration=90.0),  # terlalu panjang
+        _record(1080, 0),
+        None,
+    ])
+
+    assert [is_reel for is_reel, _ in results] == [True, True, False, False, False, False]
+
+
+def test_classify_reels_respects_rotation():
+    # Video potret yang direkam sebagai lanskap dengan metadata rotasi 90 derajat
+    rotated = _record(1920, 1080, rotation=90)
+    no_rotation_rules = dict(video_utils.DEFAULT_REEL_RULES, respect_rotation=False)
+
+    assert video_utils.classify_reel(rotated)[0] is True
+    assert video_utils.classify_reel(rotated, no_rotation_rules)[0] is False
+
+
+def test_classify_reels_custom_rules():
+    rules = dict(video_utils.DEFAULT_REEL_RULES, max_duration=90.0, aspect_ranges=((0.99, 1.01),))
+
+    results = video_utils.classify_reels([_record(1080, 1080, duration=75.0), _record(1080, 1920)], rules)
+
+    assert [is_reel for is_reel, _ in results] == [True, False]
+
+
+def test_classify_reels_partial_rules_use_defaults():
+    results = video_utils.classify_reels([_record(1080, 1920, duration=75.0), _record(1920, 1080)], {'max_duration': 90})
+
+    assert [is_reel for is_reel, _ in results] == [True, False]
+
+
+# --- media_cache.enforce_budget ---
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_cache, 'MEDIA_CACHE_DIR', str(tmp_path / 'media_cache'))
+    media_cache.ensure_cache_dir()
+    return tmp_path / 'media_cache'
+
+
+def _cache_files(cache_dir):
+    return sorted(name for name in os.listdir(cache_dir) if name != media_cache.CACHE_MARKER_FILE)
+
+
+def _cache_file(file_unique_id, size, atime):
+    path = media_cache.cache_path(f"{file_unique_id}.mp4")
+    with open(path, 'wb') as f:
+        f.write(b'\0' * size)
+    os.utime(path, (atime, atime))
+    return path
+
+
+def test_enforce_budget_within_limit_keeps_everything(cache_dir):
+    _cache_file('a', 100, 1000)
+
+    assert media_cache.enforce_budget(['a'], pin_count=0, max_bytes=100) == []
+    assert _cache_files(cache_dir) == ['a.mp4']
+
+
+def test_enforce_budget_evicts_unqueued_then_farthest_from_posting(cache_dir):
+    _cache_file('orphan_new', 100, 2000)
+    _cache_file('orphan_old', 100, 1000)
+    for file_unique_id in ('q1', 'q2', 'q3'):
+        _cache_file(file_unique_id, 100, 3000)
+
+    evicted = media_cache.enforce_budget(['q1', 'q2', 'q3'], pin_count=1, max_bytes=200)
+
+    assert evicted == ['orphan_old', 'orphan_new', 'q3']
+    assert _cache_files(cache_dir) == ['q1.mp4', 'q2.mp4']
+
+
+def test_enforce_budget_never_evicts_pinned_items(cache_dir):
+    for file_unique_id in ('q1', 'q2'):
+        _cache_file(file_unique_id, 100, 1000)
+
+    assert media_cache.enforce_budget(['q1', 'q2'], pin_count=2, max_bytes=50) == []
+    assert _cache_files(cache_dir) == ['q1.mp4', 'q2.mp4']
+
+
+def test_reconcile_removes_only_cache_files(cache_dir):
+    _cache_file('queued', 100, 1000)
+    _cache_file('orphan', 100, 1000)
+    (cache_dir / 'orphan.mp4.part').write_bytes(b'\0')
+    (cache_dir / 'notes.tar.gz').write_bytes(b'\0')
+    queue = [{'file_unique_id': 'queued', 'file_path': None}]
+
+    media_cache.reconcile(queue)
+
+    assert _cache_files(cache_dir) == ['notes.tar.gz', 'queued.mp4']
+    assert queue[0]['file_path'] == media_cache.cache_path('queued.mp4')
+
+
+def test_unmarked_directory_is_never_cleaned(tmp_path, monkeypatch):
+    (tmp_path / 'main.py').write_text('print(1)')
+    (tmp_path / 'README.md').write_text('readme')
+    monkeypatch.setattr(media_cache, 'MEDIA_CACHE_DIR', str(tmp_path))
+
+    media_cache.reconcile([])
+    assert media_cache.enforce_budget([], pin_count=0, max_bytes=0) == []
+
+    assert sorted(os.listdir(tmp_path)) == ['README.md', 'main.py']
+
+
+# --- queue_admission ---
+
+def _item(update_id, file_size=100, priority=0):
+    return {'update_id': update_id, 'file_unique_id': f"u{update_id}", 'file_size': file_size, 'priority': priority}
+
+
+def test_download_headroom():
+    queue = [_item(1), _item(2)]
+
+    assert queue_admission.download_headroom(queue, 5, 1000) == (3, 800)
+    assert queue_admission.download_headroom(queue, 0, 0) == (None, None)
+    assert queue_admission.download_headroom(queue, 1, 150) == (0, 0)
+
+
+def test_admit_under_limit_keeps_queue(tmp_path):
+    queue = [_item(1), _item(2)]
+
+    remaining, overflow = queue_admission.admit(queue, 2, 0, 'drop_oldest', str(tmp_path / 'archive.jsonl'))
+
+    assert remaining is queue
+    assert overflow == []
+
+
+def test_admit_drop_oldest_and_byte_limit(tmp_path):
+    queue = [_item(3), _item(1), _item(2, file_size=500)]
+
+    remaining, overflow = queue_admission.admit(queue, 0, 400, 'drop_oldest', str(tmp_path / 'archive.jsonl'))
+
+    assert [item['update_id'] for item in overflow] == [1, 2]
+    assert [item['update_id'] for item in remaining] == [3]
+
+
+def test_admit_drop_lowest_priority(tmp_path):
+    queue = [_item(1, priority=1), _item(2), _item(3)]
+
+    remaining, overflow = queue_admission.admit(
+        queue, 2, 0, 'drop_lowest_priority', str(tmp_path / 'archive.jsonl')
+    )
+
+    assert [item['update_id'] for item in overflow] == [2]
+    assert [item['update_id'] for item in remaining] == [1, 3]
+
+
+def test_admit_spill_appends_to_archive(tmp_path):
+    archive_path = tmp_path / 'archive.jsonl'
+    queue = [_item(1), _item(2), _item(3)]
+
+    remaining, overflow = queue_admission.admit(queue, 1, 0, 'spill', str(archive_path))
+
+    assert [item['update_id'] for item in remaining] == [3]
+    archived = [json.loads(line) for line in archive_path.read_text().splitlines()]
+    assert [item['update_id'] for item in archived] == [1, 2]
+    assert all('archived_at' in item for item in archived)
+
+
+@pytest.mark.parametrize('caption, expected', [
+    ('Video lucu #prioritas', 1),
+    ('#PRIORITY=5 penting', 5),
+    ('#prioritas:-2', -2),
+    ('tanpa tag', 0),
+    ('#prioritasku', 0),
+    (None, 0),
+])
+def test_priority_from_caption(caption, expected):
+    assert queue_admission.priority_from_caption(caption) == expected
+
+
+# --- state_store ---
+
+@pytest.mark.parametrize('backend_name', ['sqlite', 'dbm'])
+def test_state_backend_round_trip(backend_name, tmp_path):
+    backend = state_store._BACKENDS[backend_name](str(tmp_path / 'state'))
+    queue = [{'file_unique_id': 'u1', 'caption': 'Halo 😊'}]
+
+    backend.save('pending_media.json', queue)
+    backend.save('last_update_offset.txt', 42)
+
+    assert backend.load('pending_media.json', []) == queue
+    assert backend.load('last_update_offset.txt', 0) == 42
+    assert backend.load('posted_media.json', {}) == {}
+
+
+@pytest.mark.parametrize('backend_name', ['sqlite', 'dbm'])
+def test_state_backend_migrates_legacy_file(backend_name, tmp_path):
+    legacy_path = tmp_path / 'posted_media.json'
+    legacy_path.write_text(json.dumps({'u1': {'status': 'posted'}}))
+    backend = state_store._BACKENDS[backend_name](str(tmp_path / 'state'))
+
+    assert backend.load(str(legacy_path), {}) == {'u1': {'status': 'posted'}}
+
+    # Setelah migrasi, state dibaca dari backend meskipun file lama berubah
+    legacy_path.write_text('{}')
+    assert backend.load(str(legacy_path), {}) == {'u1': {'status': 'posted'}}
+
+
+def test_prune_posted_media_keeps_newest_entries():
+    posted_media = {
+        'old': {'posted_at': '2024-01-01T00:00:00'},
+        'undated': {},
+        'new': {'posted_at': '2024-03-01T00:00:00'},
+        'mid': {'posted_at': '2024-02-01T00:00:00'},
+    }
+
+    assert state_store.prune_posted_media(posted_media, 2) == 2
+    assert sorted(posted_media) == ['mid', 'new']
+
+
+@pytest.mark.parametrize('max_entries', [0, -1])
+def test_prune_posted_media_non_positive_limit_keeps_everything(max_entries):
+    posted_media = {'a': {'posted_at': '2024-01-01T00:00:00'}, 'b': {}}
+
+    assert state_store.prune_posted_media(posted_media, max_entries) == 0
+    assert len(posted_media) == 2
+
+
+def test_load_config_rejects_negative_posted_media_max_entries():
+    with pytest.raises(ConfigError):
+        config.load_config(dict(REQUIRED_ENV, POSTED_MEDIA_MAX_ENTRIES='-1'))
+
+
+# --- Pre-caption ---
+
+def _precaption_item(caption='halo', **overrides):
+    precaption = dict({
+        'caption': 'Halo! 😄',
+        'source_caption': caption,
+        'prompt_version': gemini_processor.PROMPT_VERSION,
+        'model': gemini_processor.GEMINI_MODEL,
+    }, **overrides)
+    return {'file_unique_id': 'u1', 'caption': caption, 'precaption': precaption}
+
+
+def test_get_precaption_valid_entry():
+    assert gemini_processor.get_precaption(_precaption_item()) == 'Halo! 😄'
+    assert gemini_processor.get_precaption({'file_unique_id': 'u1', 'caption': 'halo'}) is None
+
+
+@pytest.mark.parametrize('overrides', [
+    {'model': 'model-lama'},
+    {'prompt_version': 'prompt-lama'},
+    {'source_caption': 'caption lama'},
+])
+def test_get_precaption_invalidated(overrides):
+    assert gemini_processor.get_precaption(_precaption_item(**overrides)) is None
+
+
+def test_finish_precaption_keeps_partial_results():
+    release = threading.Event()
+    thread = threading.Thread(target=release.wait, daemon=True)
+    thread.start()
+    lock = threading.Lock()
+    results = {'u1': {'caption': 'sudah selesai'}}
+    queue = [{'file_unique_id': 'u1'}, {'file_unique_id': 'u2'}]
+
+    # Batas waktu sudah lewat dan worker masih berjalan: hasil yang sudah ada tetap disimpan
+    main.finish_precaption(thread, results, lock, 0, queue)
+    release.set()
+
+    assert queue == [{'file_unique_id': 'u1', 'precaption': {'caption': 'sudah selesai'}}, {'file_unique_id': 'u2'}]
+
+
+@pytest.mark.parametrize('raw, expected', [('true', True), ('1', True), ('YES', True), ('off', False), ('', False)])
+def test_load_config_precaption_enabled_values(raw, expected):
+    assert config.load_config(dict(REQUIRED_ENV, PRECAPTION_ENABLED=raw)).precaption_enabled is expected
+
+
+@pytest.mark.parametrize('overrides', [
+    {'PRECAPTION_ENABLED': 'maybe'},
+    {'PRECAPTION_BUDGET_SECONDS': '-5'},
+    {'PRECAPTION_MAX_ITEMS': '0'},
+])
+def test_load_config_rejects_invalid_precaption_settings(overrides):
+    with pytest.raises(ConfigError):
+        config.load_config(dict(REQUIRED_ENV, **overrides))
+
+
+# --- main._notify_config_error ---
+
+def test_config_error_notification_uses_code_span(monkeypatch):
+    sent = []
+    monkeypatch.setenv('TELEGRAM_BOT_TOKEN', 'token')
+    monkeypatch.setenv('TELEGRAM_CHAT_ID', '-100')
+    monkeypatch.setattr(telegram_fetcher, 'send_message', lambda bot_token, chat_id, text: sent.append(text))
+
+    main._notify_config_error(ConfigError("MAX_POSTS_PER_RUN harus minimal 1 (`x`)."))
+
+    assert sent == ["❌ Gagal: Konfigurasi AutoPost Facebook tidak valid.\n`MAX_POSTS_PER_RUN harus minimal 1 ('x').`"]
+
+
+# --- main.run_autopost ---
+
+@pytest.fixture
+def isolated_run(tmp_path, monkeypatch):
+    """Menjalankan siklus di direktori sementara; pengaturan modul dikembalikan setelah test."""
+    monkeypatch.chdir(tmp_path)
+    for module, names in (
+        (state_store, ('_backend_instance', '_posted_media_max_entries')),
+        (media_cache, ('MEDIA_CACHE_DIR', 'MEDIA_CACHE_MAX_BYTES', 'MEDIA_CACHE_PIN_COUNT')),
+        (telegram_fetcher, ('DOWNLOAD_PART_SIZE', 'DOWNLOAD_PARALLEL_THRESHOLD', 'DOWNLOAD_WORKERS',
+                            'FILE_INFO_CACHE_TTL', 'GET_UPDATES_POLL_TIMEOUT')),
+    ):
+        for name in names:
+            monkeypatch.setattr(module, name, getattr(module, name))
+    return tmp_path
+
+
+def test_empty_cycle_short_polls_and_sends_one_message(isolated_run, monkeypatch):
+    get_calls = []
+    sent = []
+
+    def fake_get(url, params=None, timeout=None, **kwargs):
+        get_calls.append((params, timeout))
+        return _FakeUpdatesResponse([])
+
+    monkeypatch.setattr(telegram_fetcher.requests, 'get', fake_get)
+    monkeypatch.setattr(telegram_fetcher, 'send_message', lambda bot_token, chat_id, text: sent.append(text))
+
+    main.run_autopost(config.load_config(REQUIRED_ENV))
+
+    assert [params['timeout'] for params, _ in get_calls] == [0]
+    assert len(sent) == 1
+
+
+def test_failed_download_gives_slot_to_next_item(isolated_run, monkeypatch):
+    queue = [
+        {'update_id': update_id, 'file_id': f"f{update_id}", 'file_unique_id': f"u{update_id}",
+         'file_path': None, 'type': 'photo', 'caption': 'halo'}
+        for update_id in (1, 2)
+    ]
+    (isolated_run / main.PENDING_MEDIA_FILE).write_text(json.dumps(queue))
+
+    def fake_download(bot_token, file_id, file_unique_id, media_type):
+        if file_unique_id == 'u2':
+            return None
+        path = media_cache.cache_path(f"{file_unique_id}.jpg")
+        with open(path, 'wb') as f:
+            f.write(b'jpg')
+        return path
+
+    monkeypatch.setattr(telegram_fetcher.requests, 'get', lambda *args, **kwargs: _FakeUpdatesResponse([]))
+    monkeypatch.setattr(telegram_fetcher, 'send_message', lambda bot_token, chat_id, text: None)
+    monkeypatch.setattr(telegram_fetcher, 'prefetch_file_info', lambda bot_token, file_ids: None)
+    monkeypatch.setattr(telegram_fetcher, 'download_telegram_file', fake_download)
+    monkeypatch.setattr(gemini_processor, 'process_caption', lambda caption, api_key: caption)
+    monkeypatch.setattr(facebook_uploader, 'upload_photo', lambda path, caption, token, page_id: 'post-1')
+
+    main.run_autopost(config.load_config(REQUIRED_ENV))
+
+    posted_media = json.loads((isolated_run / main.POSTED_MEDIA_FILE).read_text())
+    pending_media = json.loads((isolated_run / main.PENDING_MEDIA_FILE).read_text())
+    assert {media_id: entry['status'] for media_id, entry in posted_media.items()} == {'u1': 'posted'}
+    assert [(item['file_unique_id'], item['download_attempts']) for item in pending_media] == [('u2', 1)]
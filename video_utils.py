@@ -3,13 +3,37 @@ import json
 import logging
 import os
 
-# Konfigurasi logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# --- Aturan Klasifikasi Reels ---
+# Aturan default; main.py memakai aturan dari config.Config (REEL_MIN_DURATION, REEL_MAX_DURATION,
+# REEL_ASPECT_RANGES, REEL_RESPECT_ROTATION). Rentang rasio lebar/tinggi dihitung setelah rotasi;
+# default mencakup 9:16 (0.5625) hingga 4:5 (0.8) agar format hampir-vertikal tetap lewat jalur Reels.
+DEFAULT_REEL_RULES = {
+    'min_duration': 0.0,
+    'max_duration': 60.0,
+    'aspect_ranges': ((0.5525, 0.81),),
+    'respect_rotation': True,
+}
+
+# Cache hasil ffprobe per proses: (path, ukuran, mtime) -> probe record
+_probe_cache = {}
+
+def _parse_rotation(stream):
+    """Mengambil sudut rotasi dari tag 'rotate' atau side data 'rotation' (displaymatrix)."""
+    rotation = stream.get('tags', {}).get('rotate')
+    if rotation is None:
+        for side_data in stream.get('side_data_list', []):
+            if 'rotation' in side_data:
+                rotation = side_data['rotation']
+                break
+    try:
+        return int(float(rotation)) % 360 if rotation is not None else 0
+    except (TypeError, ValueError):
+        return 0
 
 def get_video_info(video_path):
     """
-    Mendapatkan informasi video (durasi, lebar, tinggi) menggunakan ffprobe.
-    Mengembalikan dictionary dengan 'duration', 'width', 'height' atau None jika gagal.
+    Mendapatkan informasi video (durasi, lebar, tinggi, rotasi) menggunakan ffprobe.
+    Mengembalikan dictionary dengan 'duration', 'width', 'height', 'rotation' atau None jika gagal.
     """
     if not os.path.exists(video_path):
         logging.error(f"File video tidak ditemukan: {video_path}")
@@ -19,7 +43,7 @@ def get_video_info(video_path):
         'ffprobe',
         '-v', 'error',
         '-select_streams', 'v:0', # Pilih stream video pertama
-        '-show_entries', 'stream=width,height,duration',
+        '-show_entries', 'stream=width,height,duration:stream_tags=rotate:stream_side_data=rotation',
         '-of', 'json',
         video_path
     ]
@@ -36,7 +60,8 @@ def get_video_info(video_path):
             return {
                 'duration': duration,
                 'width': width,
-                'height': height
+                'height': height,
+                'rotation': _parse_rotation(stream)
             }
         else:
             logging.error(f"Tidak dapat menemukan stream video di {video_path}")
@@ -54,50 +79,117 @@ def get_video_info(video_path):
         logging.error(f"Terjadi kesalahan saat mendapatkan info video untuk {video_path}: {e}", exc_info=True)
         return None
 
-def is_reel(video_path):
+def probe_video(video_path):
     """
-    Memeriksa apakah video memenuhi kriteria Facebook Reels:
-    - Durasi <= 60 detik
-    - Rasio aspek 9:16 (portrait)
+    Seperti get_video_info(), tetapi hasilnya di-cache per file (path, ukuran, mtime),
+    sehingga ffprobe hanya dijalankan sekali untuk setiap file.
     """
-    video_info = get_video_info(video_path)
+    try:
+        stat = os.stat(video_path)
+    except OSError:
+        return get_video_info(video_path)
 
-    if not video_info:
-        logging.warning(f"Tidak dapat memverifikasi video {video_path} untuk kriteria Reels.")
-        return False
+    cache_key = (os.path.abspath(video_path), stat.st_size, stat.st_mtime)
+    if cache_key not in _probe_cache:
+        _probe_cache[cache_key] = get_video_info(video_path)
+    return _probe_cache[cache_key]
 
-    duration = video_info['duration']
-    width = video_info['width']
-    height = video_info['height']
+def probe_record_from_media_info(media_info):
+    """
+    Mengembalikan probe record untuk entri antrean: hasil ffprobe yang tersimpan di 'probe',
+    atau metadata dari Telegram (width/height/duration) jika belum pernah di-probe.
+    """
+    if media_info.get('probe'):
+        return media_info['probe']
+    return {
+        'duration': float(media_info.get('duration') or 0),
+        'width': int(media_info.get('width') or 0),
+        'height': int(media_info.get('height') or 0),
+        'rotation': 0
+    }
+
+def classify_reels(probe_records, rules=None):
+    """
+    Mengklasifikasikan banyak probe record sekaligus tanpa memanggil ffprobe lagi.
+    Aturan dievaluasi per kolom (durasi, lalu rasio aspek) atas seluruh daftar.
+    rules boleh berisi sebagian kunci DEFAULT_REEL_RULES; kunci yang tidak ada memakai nilai default.
+    Mengembalikan daftar (is_reel, alasan) dengan urutan yang sama dengan input.
+    """
+    # Aturan parsial (misalnya hanya max_duration) dilengkapi dengan nilai default
+    rules = dict(DEFAULT_REEL_RULES, **(rules or {}))
+    records = [record or {} for record in probe_records]
+
+    durations = [float(record.get('duration') or 0) for record in records]
+    widths = [int(record.get('width') or 0) for record in records]
+    heights = [int(record.get('height') or 0) for record in records]
+    if rules['respect_rotation']:
+        rotated = [int(record.get('rotation') or 0) % 180 == 90 for record in records]
+        widths, heights = (
+            [h if r else w for w, h, r in zip(widths, heights, rotated)],
+            [w if r else h for w, h, r in zip(widths, heights, rotated)],
+        )
+
+    duration_ok = [rules['min_duration'] <= d <= rules['max_duration'] for d in durations]
+    aspects = [w / h if h else None for w, h in zip(widths, heights)]
+    aspect_ok = [
+        a is not None and any(low <= a <= high for low, high in rules['aspect_ranges'])
+        for a in aspects
+    ]
 
-    logging.info(f"Info video {video_path}: Durasi={duration:.2f}s, Dimensi={width}x{height}")
+    results = []
+    for record, d, w, h, a, d_ok, a_ok in zip(records, durations, widths, heights, aspects, duration_ok, aspect_ok):
+        if not record:
+            results.append((False, "info video tidak tersedia"))
+        elif not d_ok:
+            results.append((False, f"durasi {d:.2f}s di luar batas {rules['min_duration']:.0f}-{rules['max_duration']:.0f}s"))
+        elif a is None:
+            results.append((False, "tinggi video nol"))
+        elif not a_ok:
+            results.append((False, f"rasio aspek {a:.4f} ({w}x{h}) di luar rentang Reels"))
+        else:
+            results.append((True, f"durasi {d:.2f}s, rasio aspek {a:.4f} ({w}x{h})"))
+    return results
 
-    # Kriteria durasi: <= 60 detik
-    if duration > 60:
-        logging.info(f"Video bukan Reels: Durasi ({duration:.2f}s) lebih dari 60 detik.")
-        return False
+def classify_reel(probe_record, rules=None):
+    """Mengklasifikasikan satu probe record. Mengembalikan (is_reel, alasan)."""
+    return classify_reels([probe_record], rules)[0]
 
-    # Kriteria rasio aspek: 9:16 (portrait)
-    # Toleransi kecil untuk float comparison
-    aspect_ratio_target = 9 / 16
-    
-    if height == 0: # Hindari pembagian dengan nol
-        logging.warning(f"Tinggi video adalah nol untuk {video_path}. Tidak dapat menghitung rasio aspek.")
-        return False
+def plan_reel_routing(media_items, rules=None):
+    """
+    Menentukan ulang jalur (Reels atau bukan) untuk seluruh item video di antrean
+    dari probe record yang tersimpan. Mengembalikan dictionary file_unique_id -> is_reel.
+    Fungsi API untuk perencanaan ulang massal; siklus posting sendiri memakai classify_reel().
+    """
+    videos = [item for item in media_items if item.get('type') == 'video']
+    results = classify_reels([probe_record_from_media_info(item) for item in videos], rules)
+    return {item['file_unique_id']: is_reel for item, (is_reel, _) in zip(videos, results)}
 
-    current_aspect_ratio = width / height
-    
-    # Cek apakah rasio aspek mendekati 9:16
-    # Misalnya, 0.5625 (9/16)
-    # Toleransi 0.01 untuk fleksibilitas
-    if abs(current_aspect_ratio - aspect_ratio_target) > 0.01:
-        logging.info(f"Video bukan Reels: Rasio aspek ({current_aspect_ratio:.4f}) bukan 9:16 (target {aspect_ratio_target:.4f}).")
+def is_reel(video_path, rules=None):
+    """
+    Memeriksa apakah video memenuhi kriteria Facebook Reels sesuai aturan yang dikonfigurasi
+    (default: durasi <= 60 detik, rasio aspek antara 9:16 dan 4:5, memperhitungkan rotasi).
+    """
+    video_info = probe_video(video_path)
+
+    if not video_info:
+        logging.warning(f"Tidak dapat memverifikasi video {video_path} untuk kriteria Reels.")
         return False
 
-    logging.info(f"Video {video_path} memenuhi kriteria Reels.")
-    return True
+    logging.info(
+        f"Info video {video_path}: Durasi={video_info['duration']:.2f}s, "
+        f"Dimensi={video_info['width']}x{video_info['height']}, Rotasi={video_info.get('rotation', 0)}"
+    )
+
+    result, reason = classify_reel(video_info, rules)
+    if result:
+        logging.info(f"Video {video_path} memenuhi kriteria Reels: {reason}.")
+    else:
+        logging.info(f"Video bukan Reels: {reason}.")
+    return result
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
     # Contoh penggunaan (untuk pengujian lokal)
     # Anda perlu menyediakan file video untuk pengujian ini
     # Pastikan Anda memiliki FFmpeg/ffprobe terinstal di sistem Anda.